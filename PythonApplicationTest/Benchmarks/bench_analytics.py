@@ -0,0 +1,137 @@
+# Catalog analytics benchmark: columnar NumPy mirror vs looping over item dicts
+## Loads --items items (random price, tax on about half, 0-3 of 50 tags) into
+## an ItemStore and times the GET /items/stats report (overall and per tag,
+## with p50/p90/p99) computed by ItemColumns and by a plain loop over the
+## stored dicts. Also reports the one-off mirror build and a write's cost.
+##
+## python Benchmarks/bench_analytics.py --items 1000000
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import ItemColumns
+from item_store import ItemStore
+
+TAGS = [f"tag{i}" for i in range(50)]
+PERCENTILES = [50, 90, 99]
+
+
+def random_item() -> dict:
+    return {
+        "name": "item", "description": None,
+        "price": round(random.uniform(1, 1000), 2),
+        "tax": round(random.uniform(0, 50), 2) if random.random() < 0.5 else None,
+        "tags": random.sample(TAGS, random.randint(0, 3)),
+    }
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def describe(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "sum": sum(values), "mean": sum(values) / len(values), "min": values[0], "max": values[-1],
+        **{f"p{q}": percentile(values, q) for q in PERCENTILES},
+    }
+
+
+# The report without the mirror: one pass over the dicts, then sorts
+def naive_report(store: ItemStore) -> dict:
+    prices, taxes, with_tax = [], [], []
+    by_tag: dict[str, list[dict]] = {}
+    for item_id in store.ids_after(None, len(store)):
+        data = store.get(item_id)
+        prices.append(data["price"])
+        if data["tax"] is not None:
+            taxes.append(data["tax"])
+            with_tax.append(data["price"] + data["tax"])
+        for tag in data["tags"]:
+            by_tag.setdefault(tag, []).append(data)
+    tags = []
+    for tag, items in sorted(by_tag.items(), key=lambda entry: -len(entry[1])):
+        taxed = [data["price"] + data["tax"] for data in items if data["tax"] is not None]
+        tags.append({
+            "tag": tag, "count": len(items), "price": describe([data["price"] for data in items]),
+            "price_with_tax": {"count": len(taxed), "sum": sum(taxed)},
+        })
+    return {
+        "count": len(prices), "price": describe(prices), "tax": describe(taxes),
+        "price_with_tax": {"count": len(with_tax), "sum": sum(with_tax)}, "tags": tags,
+    }
+
+
+def columnar_report(columns: ItemColumns) -> dict:
+    report = columns.summary(PERCENTILES)
+    report["tags"] = columns.by_tag(PERCENTILES, len(TAGS))
+    return report
+
+
+def same(a, b) -> bool:
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float):
+        return math.isclose(a, b, rel_tol=1e-9)
+    return a == b
+
+
+def timed(fn, repeat: int) -> tuple[float, object]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ItemStore(os.path.join(data_dir, "items.log"))
+        store.open()
+        columns = ItemColumns(store)
+        for _ in range(0, args.items, 50_000):
+            store.create_many([random_item() for _ in range(min(50_000, args.items - len(store)))])
+        print(f"loaded {len(store)} items")
+
+        start = time.perf_counter()
+        columns.summary([])
+        print(f"mirror build (first query): {time.perf_counter() - start:.2f}s")
+
+        naive_time, expected = timed(lambda: naive_report(store), 1)
+        columnar_time, report = timed(lambda: columnar_report(columns), args.repeat)
+        summary_time, _ = timed(lambda: columns.summary(PERCENTILES), args.repeat)
+        assert same(report, expected), "reports differ"
+        print(f"{'report':<28}{'naive ms':>10}{'columnar ms':>13}{'speedup':>9}")
+        print(f"{'overall + per tag':<28}{naive_time * 1e3:>10.0f}{columnar_time * 1e3:>13.1f}{naive_time / columnar_time:>8.0f}x")
+        print(f"{'overall only (columnar)':<28}{'':>10}{summary_time * 1e3:>13.1f}")
+
+        item_ids = random.sample(range(1, len(store) + 1), 1000)
+        start = time.perf_counter()
+        for item_id in item_ids:
+            store.update(item_id, {"price": round(random.uniform(1, 1000), 2), "tags": ["tag3"]})
+        print(f"update with the mirror maintained: {(time.perf_counter() - start) / len(item_ids) * 1e6:.0f} us per write")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Request coalescing check: N concurrent GET /jobs/{job_id} -> one query
+## Fires --concurrency identical requests at once through the ASGI app, with
+## the job query slowed down by --backend-latency seconds (a busy database),
+## and counts how many times the backend was actually called. Exits 1 unless
+## every request got the same 200 and the backend ran exactly once.
+##
+## python Benchmarks/bench_coalesce.py --concurrency 100
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run(concurrency: int, backend_latency: float) -> tuple[int, list, float, dict]:
+    import httpx
+    import main
+
+    backend_calls = 0
+    get = main.job_queue.get
+
+    async def slow_get(job_id: int):
+        nonlocal backend_calls
+        backend_calls += 1
+        await asyncio.sleep(backend_latency)
+        return await get(job_id)
+
+    async with main.app.router.lifespan_context(main.app):
+        # Far in the future, so no worker picks it up while we read it
+        job_id = await main.job_queue.enqueue("upload.postprocess", {"path": "-"}, delay=3600)
+        main.job_queue.get = slow_get
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(client.get(f"/jobs/{job_id}") for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+        stats = main.job_reads.stats()
+    return backend_calls, responses, elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--backend-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ["ITEM_STORE_PATH"] = os.path.join(data_dir, "items.log")
+        os.environ["DATABASE_PATH"] = os.path.join(data_dir, "app.db")
+        os.environ["JOB_QUEUE_PATH"] = os.path.join(data_dir, "jobs.db")
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        backend_calls, responses, elapsed, stats = asyncio.run(run(args.concurrency, args.backend_latency))
+
+    statuses = {response.status_code for response in responses}
+    bodies = {response.content for response in responses}
+    print(f"requests        {len(responses)}")
+    print(f"statuses        {sorted(statuses)}")
+    print(f"distinct bodies {len(bodies)}")
+    print(f"backend calls   {backend_calls}")
+    print(f"collapsed       {stats['collapsed']}")
+    print(f"wall time       {elapsed * 1000:.1f} ms")
+    ok = statuses == {200} and len(bodies) == 1 and backend_calls == 1
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Compression benchmark: bandwidth saved vs CPU cost on list-of-Item responses
+## Bodies are encoded exactly as GET /items/ sends them (FastJSONResponse),
+## then run through every encoder CompressionMiddleware can negotiate here
+## (brotli / zstd only when their packages are installed).
+##
+## python Benchmarks/bench_compression.py --counts 10 100 1000 10000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import available_encoders
+from responses import json_dumps
+
+WORDS = ["portal", "gun", "plumbus", "foo", "bar", "baz", "rock", "metal", "nice", "item"]
+
+
+def make_body(count: int) -> bytes:
+    rng = random.Random(count)
+    items = [
+        {
+            "item_id": i,
+            "name": " ".join(rng.choices(WORDS, k=2)).title(),
+            "description": " ".join(rng.choices(WORDS, k=8)),
+            "price": round(rng.uniform(1, 500), 2),
+            "tax": round(rng.uniform(0, 50), 2) if rng.random() < 0.7 else None,
+        }
+        for i in range(1, count + 1)
+    ]
+    return json_dumps({"items": items, "next_cursor": None})
+
+
+def measure(make_encoder, body: bytes, min_seconds: float = 0.2) -> tuple[int, float]:
+    rounds = 0
+    start = time.perf_counter()
+    while True:
+        encoder = make_encoder()
+        size = len(encoder.compress(body) + encoder.flush())
+        rounds += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return size, elapsed / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--gzip-level", type=int, default=6)
+    args = parser.parse_args()
+
+    encoders = available_encoders(gzip_level=args.gzip_level)
+    print(f"{'items':>7}{'encoding':>10}{'bytes':>11}{'saved':>8}{'ms':>9}{'MB/s':>9}{'us/KiB saved':>14}")
+    for count in args.counts:
+        body = make_body(count)
+        print(f"{count:>7}{'identity':>10}{len(body):>11}{'-':>8}{'-':>9}{'-':>9}{'-':>14}")
+        for name, make_encoder in encoders.items():
+            size, seconds = measure(make_encoder, body)
+            saved = len(body) - size
+            print(
+                f"{count:>7}{name:>10}{size:>11}{saved / len(body):>8.1%}{seconds * 1e3:>9.3f}"
+                f"{len(body) / seconds / 1e6:>9.1f}{seconds * 1e6 / (saved / 1024):>14.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
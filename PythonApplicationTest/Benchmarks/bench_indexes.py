@@ -0,0 +1,107 @@
+# Secondary index benchmark: filtered queries vs a full scan
+## Loads --items items (random price, 0-3 of 50 tags with a skewed
+## distribution) into an ItemStore and times typical FilterParams queries
+## through ItemIndexes.query() against scanning every item, as the listing
+## did before. Also reports the one-off index build and the cost of a write.
+##
+## python Benchmarks/bench_indexes.py --items 1000000
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes import FilterParams, ItemIndexes
+from item_store import ItemStore
+
+TAGS = [f"tag{i}" for i in range(50)]
+
+QUERIES = {
+    "no filter, by created_at": {},
+    "rare tag": {"tags": ["tag49"]},
+    "common tag, by price": {"tags": ["tag0"], "order_by": "price"},
+    "two tags": {"tags": ["tag0", "tag1"]},
+    "narrow price range": {"min_price": 500.0, "max_price": 500.5},
+    "wide price range": {"min_price": 100.0, "max_price": 900.0},
+    "price range + rare tag": {"min_price": 100.0, "max_price": 900.0, "tags": ["tag40"]},
+    "price range, by price, offset 500": {"min_price": 250.0, "max_price": 750.0, "order_by": "price", "offset": 500},
+}
+
+
+def random_item() -> dict:
+    tags = random.sample(TAGS, random.choices(range(4), weights=(1, 3, 3, 1))[0])
+    tags = [tag if random.random() < 0.5 else TAGS[min(int(random.expovariate(0.2)), 49)] for tag in tags]
+    return {
+        "name": "item", "description": None, "price": round(random.uniform(1, 1000), 2), "tax": None,
+        "tags": sorted(set(tags)),
+    }
+
+
+def scan(store: ItemStore, filters: FilterParams) -> list[int]:
+    ranges = filters.ranges()
+    matched = []
+    for item_id, data in store._index.items():
+        if not all(tag in data["tags"] for tag in filters.tags):
+            continue
+        meta = store.meta(item_id)
+        values = {"price": data["price"], "created_at": meta.created, "updated_at": meta.modified}
+        if all(lo <= values[name] <= hi for name, (lo, hi) in ranges.items()):
+            matched.append((values[filters.order_by], item_id))
+    matched.sort()
+    return [item_id for _, item_id in matched[filters.offset : filters.offset + filters.limit]]
+
+
+def timed(fn, repeat: int) -> tuple[float, object]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--scan-repeat", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ItemStore(os.path.join(data_dir, "items.log"))
+        store.open()
+        indexes = ItemIndexes(store)
+        start = time.perf_counter()
+        for _ in range(0, args.items, 50_000):
+            store.create_many([random_item() for _ in range(min(50_000, args.items - len(store)))])
+        print(f"loaded {len(store)} items in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        for index in indexes.sorted.values():
+            index.ensure()
+        print(f"built sorted indexes in {time.perf_counter() - start:.2f}s, {len(indexes.tags.postings)} tags")
+
+        print(f"{'query':<36}{'matches':>9}{'index ms':>10}{'scan ms':>10}{'speedup':>10}")
+        for name, params in QUERIES.items():
+            filters = FilterParams(**params)
+            index_time, result = timed(lambda: indexes.query(filters), args.repeat)
+            scan_time, expected = timed(lambda: scan(store, filters), args.scan_repeat)
+            assert result == expected, name
+            print(f"{name:<36}{len(result):>9}{index_time * 1e3:>10.3f}{scan_time * 1e3:>10.1f}{scan_time / index_time:>9.0f}x")
+
+        item_ids = random.sample(range(1, len(store) + 1), 1000)
+        start = time.perf_counter()
+        for item_id in item_ids:
+            store.update(item_id, {"price": round(random.uniform(1, 1000), 2), "tags": ["tag3"]})
+        print(f"update with indexes maintained: {(time.perf_counter() - start) / len(item_ids) * 1e6:.0f} us per write")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# JSON encode benchmark: FastAPI's default path vs FastJSONResponse
+## Payloads are the Item / nested Item + Image models from
+## Tests/FastAPI_Core_Summary.py, alone and as a list of 100.
+##
+## python Benchmarks/bench_json.py --number 20000
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+import responses
+from responses import FastJSONResponse
+
+
+class Item(BaseModel):
+    name: str
+    description: str | None = None
+    price: float
+    tax: float | None = None
+
+
+class Image(BaseModel):
+    url: str
+    name: str
+
+
+class NestedItem(BaseModel):
+    name: str
+    description: str | None = None
+    price: float
+    tax: float | None = None
+    tags: list[str] = []
+    image: Image | None = None
+
+
+PAYLOADS = {
+    "item": Item(name="Foo", description="A very nice Item", price=35.4, tax=3.2),
+    "nested": NestedItem(
+        name="Foo",
+        description="The pretender",
+        price=42.0,
+        tax=3.2,
+        tags=["rock", "metal", "bar"],
+        image=Image(url="http://example.com/baz.jpg", name="The Foo live"),
+    ),
+}
+PAYLOADS["nested x100"] = [PAYLOADS["nested"]] * 100
+
+
+# What a handler returning item.dict() costs today (model_dump is the same call)
+def default_path(payload):
+    if isinstance(payload, list):
+        content = [p.model_dump() for p in payload]
+    else:
+        content = payload.model_dump()
+    return JSONResponse(jsonable_encoder(content))
+
+
+def fast_path(payload):
+    return FastJSONResponse(payload)
+
+
+def fallback_path(payload):
+    orjson, responses.orjson = responses.orjson, None
+    try:
+        return FastJSONResponse(payload)
+    finally:
+        responses.orjson = orjson
+
+
+# Peak traced memory while building one response, in KiB
+def peak_allocation(fn, payload) -> float:
+    fn(payload)
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    paths = {"default": default_path, "fast": fast_path, "fallback": fallback_path}
+    if responses.orjson is None:
+        print("orjson not installed: 'fast' uses the stdlib fallback too\n")
+
+    print(f"{'payload':<14}{'path':<10}{'us/op':>10}{'speedup':>9}{'peak KiB':>10}")
+    for name, payload in PAYLOADS.items():
+        number = args.number // 20 if isinstance(payload, list) else args.number
+        baseline = None
+        for path, fn in paths.items():
+            seconds = min(timeit.repeat(lambda: fn(payload), number=number, repeat=3))
+            us = seconds / number * 1e6
+            baseline = baseline or us
+            peak = peak_allocation(fn, payload)
+            print(f"{name:<14}{path:<10}{us:>10.2f}{baseline / us:>8.2f}x{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
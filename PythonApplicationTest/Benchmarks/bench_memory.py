@@ -0,0 +1,79 @@
+# Item store memory benchmark: bytes per stored item, measured with tracemalloc
+## Loads --items items shaped like Item.dict() (name, optional description,
+## price, optional tax, 0-3 of 50 tags) into an ItemStore with create_many,
+## then opens a second store on the same log (startup replay), and reports
+## the memory each one keeps per item. Only the store itself is measured: no
+## listeners (read cache, indexes, search, analytics) are attached.
+##
+## python Benchmarks/bench_memory.py --items 1000000
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from item_store import ItemStore
+
+TAGS = [f"tag{i}" for i in range(50)]
+
+
+def random_item(item_number: int) -> dict:
+    return {
+        "name": f"Item {item_number}",
+        "description": f"Description of item {item_number}" if random.random() < 0.5 else None,
+        "price": round(random.uniform(1, 1000), 2),
+        "tax": round(random.uniform(0, 50), 2) if random.random() < 0.5 else None,
+        "tags": random.sample(TAGS, random.randint(0, 3)),
+    }
+
+
+def measure(label: str, load, items: int) -> ItemStore:
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    store = load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    print(f"{label:<22}{retained / 2**20:>10.1f} MiB{retained / items:>10.0f} B/item{elapsed:>9.1f} s")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1_000_000)
+    args = parser.parse_args()
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, "items.log")
+        tracemalloc.start()
+
+        def create() -> ItemStore:
+            store = ItemStore(path)
+            store.open()
+            for first in range(0, args.items, 50_000):
+                store.create_many([random_item(n) for n in range(first, min(first + 50_000, args.items))])
+            return store
+
+        def replay() -> ItemStore:
+            store = ItemStore(path)
+            store.open()
+            return store
+
+        created = measure("create_many", create, args.items)
+        created.close()
+        del created
+        replayed = measure("replay on open", replay, args.items)
+        replayed.close()
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Route benchmark harness for main.py
+## Drives every route in-process over ASGI (no server, no network), first
+## under load with `--concurrency` clients for latency percentiles and
+## throughput, then sequentially under tracemalloc for per-request peak
+## allocation. Results can be saved as JSON and compared against a previous
+## run; a p95 or allocation regression beyond --threshold exits non-zero.
+##
+## python Benchmarks/bench_routes.py --requests 2000 --concurrency 32 --output base.json
+## python Benchmarks/bench_routes.py --compare base.json
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+UPLOAD = os.urandom(64 * 1024)
+
+# Routes dominated by the password KDF; they run --slow-requests times
+SLOW_ROUTES = {"POST /user/", "POST /login/"}
+
+
+# name -> function building the request kwargs for the i-th call
+def route_table(token: str) -> dict:
+    item = {"name": "Portal Gun", "description": "Interdimensional", "price": 42.0, "tax": 3.2}
+    usernames = (f"bench-{n}" for n in itertools.count())
+    return {
+        "POST /items/": lambda i: {"method": "POST", "url": "/items/", "json": item},
+        "PUT /items/{item_id}": lambda i: {"method": "PUT", "url": f"/items/{i % 100 + 1}", "json": item},
+        "GET /items/{item_id}": lambda i: {"method": "GET", "url": f"/items/{i % 100 + 1}"},
+        "GET /items/{item_id} 304": lambda i: {
+            "method": "GET", "url": f"/items/{i % 100 + 1}", "headers": {"if-none-match": "*"},
+        },
+        "GET /items/": lambda i: {"method": "GET", "url": "/items/", "params": {"limit": 20}},
+        "GET /status/": lambda i: {"method": "GET", "url": "/status/", "params": {"status": "archived"}},
+        "POST /submit-form/": lambda i: {
+            "method": "POST", "url": "/submit-form/", "data": {"username": "rick", "password": "pickle"},
+        },
+        "POST /uploadfile/": lambda i: {
+            "method": "POST", "url": "/uploadfile/", "files": {"file": ("bench.bin", UPLOAD)},
+        },
+        "GET /cookie/": lambda i: {"method": "GET", "url": "/cookie/", "headers": {"cookie": "my_cookie=chocolate"}},
+        "GET /protected/": lambda i: {"method": "GET", "url": "/protected/", "headers": {"token": token}},
+        "GET /items/export": lambda i: {"method": "GET", "url": "/items/export"},
+        "GET /cache/stats": lambda i: {"method": "GET", "url": "/cache/stats"},
+        "GET /metrics": lambda i: {"method": "GET", "url": "/metrics"},
+        "POST /user/": lambda i: {"method": "POST", "url": "/user/", "json": {
+            "username": next(usernames), "email": "bench@example.com", "password": "hunter2",
+        }},
+        "POST /login/": lambda i: {
+            "method": "POST", "url": "/login/", "data": {"username": "bench", "password": "hunter2"},
+        },
+    }
+
+
+def percentile(sorted_samples: list[float], q: float) -> float:
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+async def load(client: httpx.AsyncClient, build, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await client.request(**build(i))
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p95_ms": percentile(latencies, 0.95) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+    }
+
+
+async def allocations(client: httpx.AsyncClient, build, requests: int) -> float:
+    # Peak traced bytes above the baseline, averaged over sequential requests.
+    # Includes the in-process client's share, which is the same for every run.
+    peaks = []
+    tracemalloc.start()
+    for i in range(requests):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await client.request(**build(i))
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - current)
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+async def run(args) -> dict:
+    import main
+
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Seed items 1..100 so the GET/PUT routes hit existing items
+            await client.post("/items/batch", json=[
+                {"name": f"Item {i}", "price": float(i), "tax": 1.0} for i in range(1, 101)
+            ])
+            await client.post("/user/", json={"username": "bench", "email": "bench@example.com", "password": "hunter2"})
+            routes = route_table(main.token_verifier.issue("bench", ttl=3600))
+            for name, build in routes.items():
+                if args.routes and not any(pattern in name for pattern in args.routes):
+                    continue
+                requests = args.slow_requests if name in SLOW_ROUTES else args.requests
+                await load(client, build, min(50, requests), args.concurrency)  # warm-up
+                row = await load(client, build, requests, args.concurrency)
+                row["alloc_kib_per_request"] = await allocations(client, build, min(args.alloc_requests, requests)) / 1024
+                results[name] = row
+                print(
+                    f"{name:<24}{row['throughput_rps']:>10.0f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+                    f"{row['p99_ms']:>9.2f}{row['alloc_kib_per_request']:>11.1f}{row['errors']:>8}"
+                )
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    regressed = False
+    print(f"\nvs baseline ({threshold:.0%} threshold):")
+    for name, row in results.items():
+        old = baseline["routes"].get(name)
+        if old is None:
+            continue
+        deltas = []
+        for metric in ("p95_ms", "alloc_kib_per_request", "throughput_rps"):
+            change = (row[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            worse = -change if metric == "throughput_rps" else change
+            flag = " !" if worse > threshold and metric != "throughput_rps" else ""
+            regressed |= bool(flag)
+            deltas.append(f"{metric} {change:+.1%}{flag}")
+        print(f"  {name:<24}" + ", ".join(deltas))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route")
+    parser.add_argument("--slow-requests", type=int, default=32, help="requests per password-hashing route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--alloc-requests", type=int, default=50)
+    parser.add_argument("--routes", nargs="*", help="only routes whose name contains one of these")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ["ITEM_STORE_PATH"] = os.path.join(data_dir, "items.log")
+        os.environ["DATABASE_PATH"] = os.path.join(data_dir, "app.db")
+        os.environ["UPLOAD_SPOOL_DIR"] = os.path.join(data_dir, "uploads")
+        os.environ["UPLOAD_STORE_DIR"] = os.path.join(data_dir, "files")
+        os.environ["JOB_QUEUE_PATH"] = os.path.join(data_dir, "jobs.db")
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+        os.environ.setdefault("PASSWORD_HASH_MAX_PENDING", str(args.concurrency))
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+        print(f"{'route':<24}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'KiB/req':>11}{'errors':>8}")
+        results = asyncio.run(run(args))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "routes": results,
+    }
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            if compare(results, json.load(baseline_file), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Signup storm benchmark: latency of an unrelated route while users sign up
+## Drives the app in-process over ASGI. While `--signups` concurrent POST
+## /user/ requests run, GET /status/ is probed every few milliseconds.
+## "inline" hashes on the event loop (the old fake_save_user behaviour with a
+## real KDF); "pool" is the PasswordHasher process pool.
+##
+## python Benchmarks/bench_signup.py --signups 64
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+
+def percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+# Time from when a probe was due until its response arrived, so time spent
+# waiting for a blocked event loop counts, not just the request itself
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        response = await client.get("/status/")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - due)
+    return latencies
+
+
+async def run(mode: str, signups: int, interval: float) -> dict:
+    import main
+
+    if mode == "inline":
+        async def inline_submit(fn, *args):
+            return fn(*args)
+        main.password_hasher._submit = inline_submit
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            baseline_stop = asyncio.Event()
+            baseline_task = asyncio.create_task(probe(client, baseline_stop, interval))
+            await asyncio.sleep(0.5)
+            baseline_stop.set()
+            baseline = await baseline_task
+
+            stop = asyncio.Event()
+            probe_task = asyncio.create_task(probe(client, stop, interval))
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/user/", json={
+                    "username": f"{mode}-{i}", "email": f"user{i}@example.com", "password": "hunter2",
+                })
+                for i in range(signups)
+            ))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            loaded = await probe_task
+
+    statuses = [response.status_code for response in responses]
+    return {
+        "mode": mode,
+        "signups_ok": statuses.count(200),
+        "signups_shed": statuses.count(503),
+        "storm_seconds": elapsed,
+        "idle_p50_ms": statistics.median(baseline) * 1e3,
+        "p50_ms": statistics.median(loaded) * 1e3,
+        "p99_ms": percentile(loaded, 0.99) * 1e3,
+        "max_ms": max(loaded) * 1e3,
+        "probes": len(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signups", type=int, default=64)
+    parser.add_argument("--interval", type=float, default=0.005)
+    parser.add_argument("--mode", choices=["inline", "pool"], nargs="+", default=["inline", "pool"])
+    args = parser.parse_args()
+
+    for mode in args.mode:
+        with tempfile.TemporaryDirectory() as data_dir:
+            os.environ["ITEM_STORE_PATH"] = os.path.join(data_dir, "items.log")
+            os.environ["DATABASE_PATH"] = os.path.join(data_dir, "app.db")
+            os.environ.setdefault("PASSWORD_HASH_MAX_PENDING", str(args.signups))
+            os.environ.setdefault("LOG_LEVEL", "WARNING")
+            sys.modules.pop("main", None)
+            row = asyncio.run(run(mode, args.signups, args.interval))
+        print(
+            f"{row['mode']:<7} signups ok={row['signups_ok']} shed={row['signups_shed']} "
+            f"in {row['storm_seconds']:.2f}s | /status/ idle p50 {row['idle_p50_ms']:.2f} ms, "
+            f"during storm p50 {row['p50_ms']:.2f} ms, p99 {row['p99_ms']:.2f} ms, "
+            f"max {row['max_ms']:.2f} ms ({row['probes']} probes)"
+        )
+
+
+if __name__ == "__main__":
+    main()
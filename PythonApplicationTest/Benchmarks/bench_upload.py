@@ -0,0 +1,108 @@
+# Upload memory benchmark: `await file.read()` vs chunked stream_upload
+## Each (mode, size) case runs in a fresh subprocess so peak RSS is not
+## polluted by earlier cases. The upload is pre-spooled to disk the same way
+## Starlette does for multipart bodies, then consumed by the handler logic.
+##
+## python Benchmarks/bench_upload.py --sizes 16 64 256 1024
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+
+from uploads import stream_upload
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MIB = 1024 * 1024
+
+
+def peak_rss_mib() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (MIB if sys.platform == "darwin" else 1024)
+
+
+def make_upload(size_mib: int) -> UploadFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=MIB)
+    block = os.urandom(MIB)
+    for _ in range(size_mib):
+        spooled.write(block)
+    spooled.seek(0)
+    return UploadFile(spooled, filename="bench.bin")
+
+
+async def read_whole(file: UploadFile) -> int:
+    content = await file.read()
+    return len(content)
+
+
+async def read_streamed(file: UploadFile, spool_dir: str | None) -> int:
+    result = await stream_upload(file, spool_dir=spool_dir)
+    if result.path:
+        os.remove(result.path)
+    return result.size
+
+
+def run_case(mode: str, size_mib: int) -> dict:
+    upload = make_upload(size_mib)
+    rss_before = peak_rss_mib()
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as spool_dir:
+        if mode == "read":
+            size = asyncio.run(read_whole(upload))
+        else:
+            size = asyncio.run(read_streamed(upload, spool_dir if mode == "spool" else None))
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = peak_rss_mib()
+    return {
+        "mode": mode,
+        "size_mib": size_mib,
+        "bytes": size,
+        "traced_peak_mib": round(traced_peak / MIB, 2),
+        "peak_rss_mib": round(rss_after, 1) if rss_after is not None else None,
+        "rss_growth_mib": round(rss_after - rss_before, 1) if rss_after is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--modes", nargs="+", default=["read", "stream", "spool"])
+    parser.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], int(args.case[1]))))
+        return
+
+    print(f"{'mode':<8}{'MiB':>8}{'traced peak':>14}{'peak RSS':>12}{'RSS growth':>13}")
+    for size in args.sizes:
+        for mode in args.modes:
+            out = subprocess.run(
+                [sys.executable, __file__, "--case", mode, str(size)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            row = json.loads(out)
+            print(
+                f"{row['mode']:<8}{row['size_mib']:>8}{row['traced_peak_mib']:>14}"
+                f"{str(row['peak_rss_mib']):>12}{str(row['rss_growth_mib']):>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Path/query validation benchmark: FastRejectMiddleware on vs off
+## Calls the ASGI app directly (no HTTP client in the measurement) with
+## valid and invalid requests and reports the mean / p99 time per request.
+## "off" is FastAPI's own validation inside the route; "on" rejects invalid
+## requests with the precompiled checks before routing.
+##
+## python Benchmarks/bench_validation.py --requests 20000
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ITEM_BODY = json.dumps({"name": "x" * 4000, "price": 1.0}).encode()
+
+CASES = [
+    ("valid GET /items/1", "GET", "/items/1", b"item-query=fixedquery", b""),
+    ("valid GET /status/", "GET", "/status/", b"status=archived", b""),
+    ("bad path GET /items/0", "GET", "/items/0", b"", b""),
+    ("bad query GET /items/1", "GET", "/items/1", b"item-query=nope", b""),
+    ("bad literal GET /status/", "GET", "/status/", b"status=bogus", b""),
+    ("bad path PUT /items/0 4KB", "PUT", "/items/0", b"", ITEM_BODY),
+]
+
+
+def percentile(sorted_samples: list[float], q: float) -> float:
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+async def call(app, method: str, path: str, query_string: bytes, body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query_string,
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run(requests: int) -> dict:
+    import main
+
+    rows = {}
+    async with main.app.router.lifespan_context(main.app):
+        await call(main.app, "POST", "/items/", b"", json.dumps({"name": "a", "price": 1.0}).encode())
+        for name, method, path, query_string, body in CASES:
+            for _ in range(min(1000, requests)):  # warm-up
+                status = await call(main.app, method, path, query_string, body)
+            samples = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                await call(main.app, method, path, query_string, body)
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            rows[name] = (status, statistics.fmean(samples) * 1e6, percentile(samples, 0.99) * 1e6)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("off", "on"):
+        with tempfile.TemporaryDirectory() as data_dir:
+            os.environ["ITEM_STORE_PATH"] = os.path.join(data_dir, "items.log")
+            os.environ["DATABASE_PATH"] = os.path.join(data_dir, "app.db")
+            os.environ["FAST_REJECT_ENABLED"] = "1" if mode == "on" else "0"
+            os.environ["RATE_LIMIT_ENABLED"] = "0"
+            os.environ.setdefault("LOG_LEVEL", "WARNING")
+            sys.modules.pop("main", None)
+            results[mode] = asyncio.run(run(args.requests))
+
+    print(f"{'case':<28}{'status':>7}{'off us':>9}{'off p99':>9}{'on us':>9}{'on p99':>9}{'speedup':>9}")
+    for name, *_ in CASES:
+        status, off_mean, off_p99 = results["off"][name]
+        _, on_mean, on_p99 = results["on"][name]
+        print(f"{name:<28}{status:>7}{off_mean:>9.1f}{off_p99:>9.1f}{on_mean:>9.1f}{on_p99:>9.1f}{off_mean / on_mean:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
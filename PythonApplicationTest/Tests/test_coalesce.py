@@ -0,0 +1,163 @@
+# SingleFlight coalescing
+## python -m pytest Tests/test_coalesce.py
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coalesce import SingleFlight
+
+
+class Backend:
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+
+    async def load(self, key):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.latency)
+        return {"key": key, "call": call}
+
+
+def test_concurrent_calls_share_one_computation():
+    async def run():
+        flight, backend = SingleFlight(), Backend()
+        results = await asyncio.gather(*(flight.do(1, lambda: backend.load(1)) for _ in range(100)))
+        return flight, backend, results
+
+    flight, backend, results = asyncio.run(run())
+    assert backend.calls == 1
+    assert all(result == {"key": 1, "call": 1} for result in results)
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "collapsed": 99, "timeouts": 0}
+
+
+def test_different_keys_do_not_coalesce():
+    async def run():
+        flight, backend = SingleFlight(), Backend()
+        await asyncio.gather(*(flight.do(key, lambda key=key: backend.load(key)) for key in (1, 2, 1, 2)))
+        return backend
+
+    assert asyncio.run(run()).calls == 2
+
+
+def test_nothing_is_cached_after_the_flight_lands():
+    async def run():
+        flight, backend = SingleFlight(), Backend(latency=0)
+        first = await flight.do(1, lambda: backend.load(1))
+        second = await flight.do(1, lambda: backend.load(1))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first["call"], second["call"]) == (1, 2)
+
+
+def test_every_caller_gets_the_exception():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("backend down")
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do(1, fail) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def run():
+        flight, backend = SingleFlight(), Backend()
+        first = asyncio.ensure_future(flight.do(1, lambda: backend.load(1)))
+        second = asyncio.ensure_future(flight.do(1, lambda: backend.load(1)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return backend, await second
+
+    backend, result = asyncio.run(run())
+    assert backend.calls == 1
+    assert result == {"key": 1, "call": 1}
+
+
+def test_caller_past_max_wait_runs_its_own_call():
+    async def run():
+        flight, slow_backend, backend = SingleFlight(max_wait=0.01), Backend(latency=0.2), Backend(latency=0)
+        slow = asyncio.ensure_future(flight.do(1, lambda: slow_backend.load(1)))
+        await asyncio.sleep(0)
+        impatient = await flight.do(1, lambda: backend.load(1))
+        return flight, backend, impatient, await slow
+
+    flight, backend, impatient, slow = asyncio.run(run())
+    assert backend.calls == 1  # ran its own call instead of waiting out the slow one
+    assert slow == impatient == {"key": 1, "call": 1}
+    assert flight.timeouts == 1
+
+
+def test_coalesce_decorator_keys_on_arguments():
+    flight, backend = SingleFlight(), Backend()
+
+    @flight.coalesce(key=lambda key: key)
+    async def load(key):
+        return await backend.load(key)
+
+    async def run():
+        return await asyncio.gather(load(1), load(1), load(2))
+
+    results = asyncio.run(run())
+    assert backend.calls == 2
+    assert results[0] is results[1]
+    assert results[2]["key"] == 2
+    assert load.__name__ == "load"
+
+
+# caught_up_store: concurrent reads behind another worker's write share one refresh
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    for name, path in [
+        ("ITEM_STORE_PATH", "items.log"),
+        ("DATABASE_PATH", "app.db"),
+        ("JOB_QUEUE_PATH", "jobs.db"),
+        ("UPLOAD_SPOOL_DIR", "uploads"),
+        ("UPLOAD_STORE_DIR", "files"),
+    ]:
+        monkeypatch.setenv(name, str(tmp_path / path))
+    import main
+    return main
+
+
+@pytest.mark.parametrize("concurrency", [1, 10, 100])
+def test_store_refreshes_coalesce(app, tmp_path, monkeypatch, concurrency):
+    from item_store import ItemStore
+
+    path = str(tmp_path / "shared.log")
+    reader, writer = ItemStore(path), ItemStore(path)
+    reader.open()
+    writer.open()
+    refreshes = []
+    refresh = reader.refresh
+
+    def counted_refresh():
+        refreshes.append(1)
+        time.sleep(0.05)  # a replay long enough for the other reads to arrive
+        refresh()
+
+    monkeypatch.setattr(reader, "refresh", counted_refresh)
+    monkeypatch.setattr(app, "store", reader)
+    monkeypatch.setattr(app, "store_refreshes", SingleFlight())
+
+    async def run():
+        await asyncio.gather(*(app.caught_up_store() for _ in range(concurrency)))
+
+    item_id, _ = writer.create({"name": "written by another worker", "price": 1.0})
+    asyncio.run(run())
+    assert len(refreshes) == 1
+    assert reader.get(item_id) is not None
+    assert not reader.stale()
+    asyncio.run(run())  # caught up: no refresh at all
+    assert len(refreshes) == 1
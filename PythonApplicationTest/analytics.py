@@ -0,0 +1,293 @@
+from contextlib import contextmanager
+import math
+import sys
+import threading
+
+import numpy as np
+
+from item_store import ItemRecord, ItemStore
+
+
+def _grow(array: np.ndarray, needed: int, fill=0) -> np.ndarray:
+    if needed <= len(array):
+        return array
+    grown = np.full(max(needed, 2 * len(array), 1024), fill, dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+def _describe(values: np.ndarray, percentiles: list[float]) -> dict:
+    if not values.size:
+        return {"sum": 0.0, "mean": None, "min": None, "max": None, **{_label(q): None for q in percentiles}}
+    points = np.percentile(values, percentiles) if percentiles else []
+    return {
+        "sum": float(values.sum()),
+        "mean": float(values.mean()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        **{_label(q): float(point) for q, point in zip(percentiles, points)},
+    }
+
+
+def _label(q: float) -> str:
+    return f"p{q:g}"
+
+
+# Columnar mirror of the item store for aggregate queries
+## One row per item in NumPy columns (price, tax with NaN for "no tax", a live
+## flag) and the tags dictionary-encoded as (row, tag code) pairs, so reports
+## are a handful of vectorized operations instead of a loop over item dicts.
+## A store listener keeps it in sync: updates overwrite the item's row, tag
+## changes retire its old pairs and append new ones, deletes clear the live
+## flag. Like the sorted indexes, it is built on first use and dropped after a
+## burst of `rebuild_after` writes with no query (replay, big batches) or once
+## half of it is dead; the next query rebuilds it in one pass over the store.
+## Listeners may run on the store maintenance thread, hence the lock. A build
+## (seconds at 1M items) runs without it, in the caller's worker thread:
+## writes arriving meanwhile are queued and applied once it is done, so a
+## write never waits for a build. Builds are serialized by `_build_lock`.
+
+class ItemColumns:
+    def __init__(self, store: ItemStore, rebuild_after: int = 10000):
+        self.store = store
+        self.rebuild_after = rebuild_after
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built = False
+        self._building = False
+        self._pending: dict[int, ItemRecord | None] = {}  # writes during a build
+        self._writes = 0
+        self.rebuilds = 0
+        self._reset()
+        store.subscribe(self._on_write)
+
+    def _reset(self):
+        self._rows: dict[int, int] = {}  # item_id -> row
+        self._size = 0  # rows in use, live or dead
+        self._price = np.empty(0, dtype=np.float64)
+        self._tax = np.empty(0, dtype=np.float64)
+        self._live = np.empty(0, dtype=bool)
+        self._pair_start = np.empty(0, dtype=np.int64)  # first tag pair of each row
+        self._pair_count = np.empty(0, dtype=np.int32)
+
+        self._tag_codes: dict[str, int] = {}
+        self._tag_names: list[str] = []
+        self._pairs = 0
+        self._pair_rows = np.empty(0, dtype=np.int64)
+        self._pair_codes = np.empty(0, dtype=np.int32)
+        self._pair_live = np.empty(0, dtype=bool)
+        self._dead_pairs = 0
+
+    # Maintenance
+
+    def _on_write(self, item_id: int, data: ItemRecord | None):
+        with self._lock:
+            if self._building:
+                self._pending[item_id] = data
+                return
+            if not self._built:
+                return
+            self._writes += 1
+            if self._writes > self.rebuild_after:
+                self._drop()
+                return
+            self._apply(item_id, data)
+
+    def _apply(self, item_id: int, data: ItemRecord | None):
+        # Call with the lock held
+        row = self._rows.get(item_id)
+        if data is None:
+            if row is not None:
+                self._retire_tags(row)
+                del self._rows[item_id]
+                self._live[row] = False
+                if len(self._rows) < self._size // 2:
+                    self._drop()
+            return
+        if row is None:
+            row = self._rows[item_id] = self._size
+            self._size += 1
+            self._price = _grow(self._price, self._size)
+            self._tax = _grow(self._tax, self._size)
+            self._live = _grow(self._live, self._size)
+            self._pair_start = _grow(self._pair_start, self._size)
+            self._pair_count = _grow(self._pair_count, self._size)
+        self._price[row] = data.get("price") or 0.0
+        tax = data.get("tax")
+        self._tax[row] = math.nan if tax is None else tax
+        self._live[row] = True
+        tags = list(dict.fromkeys(data.get("tags") or ()))
+        if self._row_tags(row) != tags:
+            self._retire_tags(row)
+            self._append_tags(row, tags)
+        if self._dead_pairs > self._pairs // 2 > 0:
+            self._drop()
+
+    def _drop(self):
+        self._built = False
+        self._reset()
+
+    def _code(self, tag: str) -> int:
+        code = self._tag_codes.get(tag)
+        if code is None:
+            code = self._tag_codes[tag] = len(self._tag_names)
+            self._tag_names.append(tag)
+        return code
+
+    def _row_tags(self, row: int) -> list[str]:
+        start, count = self._pair_start[row], self._pair_count[row]
+        return [self._tag_names[code] for code in self._pair_codes[start : start + count]]
+
+    def _append_tags(self, row: int, tags: list[str]):
+        end = self._pairs + len(tags)
+        self._pair_rows = _grow(self._pair_rows, end)
+        self._pair_codes = _grow(self._pair_codes, end)
+        self._pair_live = _grow(self._pair_live, end)
+        self._pair_rows[self._pairs : end] = row
+        self._pair_codes[self._pairs : end] = [self._code(tag) for tag in tags]
+        self._pair_live[self._pairs : end] = True
+        self._pair_start[row] = self._pairs
+        self._pair_count[row] = len(tags)
+        self._pairs = end
+
+    def _retire_tags(self, row: int):
+        start, count = self._pair_start[row], self._pair_count[row]
+        self._pair_live[start : start + count] = False
+        self._pair_count[row] = 0
+        self._dead_pairs += int(count)
+
+    @contextmanager
+    def _ready(self):
+        # The built mirror, with the lock held
+        with self._build_lock:
+            self._lock.acquire()
+            try:
+                self._ensure()
+            except BaseException:
+                self._lock.release()
+                raise
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    def _ensure(self):
+        # Call with both locks held; the lock is released while building
+        self._writes = 0
+        while not self._built:
+            self._building = True
+            self._lock.release()
+            try:
+                state = self._build()
+            finally:
+                self._lock.acquire()
+                self._building = False
+            (
+                self._rows, self._size, self._price, self._tax, self._live, self._pair_start, self._pair_count,
+                self._tag_codes, self._tag_names, self._pairs, self._pair_rows, self._pair_codes, self._pair_live,
+            ) = state
+            self._dead_pairs = 0
+            self._built = True
+            self.rebuilds += 1
+            # Writes made during the build (applying them may drop it again)
+            pending, self._pending = self._pending, {}
+            for item_id, data in pending.items():
+                if self._built:
+                    self._apply(item_id, data)
+
+    def _build(self) -> tuple:
+        # One pass over a snapshot of the ids; items deleted since are
+        # skipped (their delete is queued too)
+        item_ids = []
+        tag_codes: dict[str, int] = {}
+        prices, taxes, pair_rows, pair_codes = [], [], [], []
+        snapshot = self.store.ids_after(None, sys.maxsize)
+        pair_start = np.zeros(len(snapshot), dtype=np.int64)
+        pair_count = np.zeros(len(snapshot), dtype=np.int32)
+        for item_id in snapshot:
+            data = self.store.get(item_id)
+            if data is None:
+                continue
+            row = len(item_ids)
+            item_ids.append(item_id)
+            prices.append(data.get("price") or 0.0)
+            tax = data.get("tax")
+            taxes.append(math.nan if tax is None else tax)
+            tags = data.get("tags")
+            if tags:
+                tags = list(dict.fromkeys(tags))
+                pair_start[row] = len(pair_codes)
+                pair_count[row] = len(tags)
+                pair_rows.extend([row] * len(tags))
+                pair_codes.extend([tag_codes.setdefault(tag, len(tag_codes)) for tag in tags])
+        return (
+            dict(zip(item_ids, range(len(item_ids)))),
+            len(item_ids),
+            np.array(prices, dtype=np.float64),
+            np.array(taxes, dtype=np.float64),
+            np.ones(len(item_ids), dtype=bool),
+            pair_start[: len(item_ids)],
+            pair_count[: len(item_ids)],
+            tag_codes,
+            list(tag_codes),
+            len(pair_codes),
+            np.array(pair_rows, dtype=np.int64),
+            np.array(pair_codes, dtype=np.int32),
+            np.ones(len(pair_codes), dtype=bool),
+        )
+
+    # Reports
+
+    def summary(self, percentiles: list[float]) -> dict:
+        with self._ready():
+            live = self._live[: self._size]
+            price = self._price[: self._size][live]
+            tax = self._tax[: self._size][live]
+        taxed = ~np.isnan(tax)
+        return {
+            "count": int(price.size),
+            "price": _describe(price, percentiles),
+            "tax": _describe(tax[taxed], percentiles),
+            "price_with_tax": {"count": int(taxed.sum()), "sum": float((price[taxed] + tax[taxed]).sum())},
+        }
+
+    # Per-tag aggregates, the `top` most used tags first
+    def by_tag(self, percentiles: list[float], top: int) -> list[dict]:
+        with self._ready():
+            live = self._pair_live[: self._pairs]
+            codes = self._pair_codes[: self._pairs][live]
+            rows = self._pair_rows[: self._pairs][live]
+            price = self._price[rows]
+            tax = self._tax[rows]
+            names = list(self._tag_names)
+        tags = len(names)
+        counts = np.bincount(codes, minlength=tags)
+        taxed = ~np.isnan(tax)
+        taxed_counts = np.bincount(codes[taxed], minlength=tags)
+        with_tax_sums = np.bincount(codes[taxed], weights=price[taxed] + tax[taxed], minlength=tags)
+
+        # Prices grouped by tag (a stable sort on the small codes is a radix
+        # sort); tag c spans [starts[c], starts[c] + counts[c])
+        grouped = price[np.argsort(codes.astype(np.int16) if tags <= 2**15 else codes, kind="stable")]
+        starts = np.cumsum(counts) - counts
+        used = np.flatnonzero(counts)
+        used = used[np.argsort(-counts[used], kind="stable")][:top]
+        return [
+            {
+                "tag": names[code],
+                "count": int(counts[code]),
+                "price": _describe(grouped[starts[code] : starts[code] + counts[code]], percentiles),
+                "price_with_tax": {"count": int(taxed_counts[code]), "sum": float(with_tax_sums[code])},
+            }
+            for code in used
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "built": self._built,
+            "rows": self._size,
+            "live": len(self._rows),
+            "tags": len(self._tag_names),
+            "tag_pairs": self._pairs - self._dead_pairs,
+            "rebuilds": self.rebuilds,
+        }
@@ -0,0 +1,74 @@
+from fastapi import HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import from_json
+from typing import Any
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+
+# Batch body parsing and validation
+## The body is decoded first (pydantic's JSON parser), so the batch size is
+## checked before any element is validated; NDJSON is decoded line by line,
+## so every line is exactly one element. The whole batch is then validated by
+## one TypeAdapter(list[Model]) call. Only when that fails do we fall back to
+## locating the bad elements, so one bad row doesn't reject its neighbours.
+
+def batch_openapi(adapter: TypeAdapter) -> dict:
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": adapter.json_schema()},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    }
+
+
+async def validate_batch(
+    request: Request,
+    adapter: TypeAdapter,
+    max_size: int,
+) -> tuple[list[tuple[int, Any]], dict[int, list[dict]]]:
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    errors: dict[int, list[dict]] = {}
+    if content_type in NDJSON_CONTENT_TYPES:
+        lines = [line for line in body.splitlines() if line.strip()]
+        if len(lines) > max_size:
+            raise HTTPException(status_code=413, detail=f"Batch larger than {max_size} items")
+        raw = []
+        for index, line in enumerate(lines):
+            try:
+                raw.append(from_json(line))
+            except ValueError:
+                raw.append(None)
+                errors[index] = [{"loc": [], "msg": "Invalid JSON", "type": "json_invalid"}]
+    else:
+        try:
+            raw = from_json(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body is not valid JSON")
+        if not isinstance(raw, list):
+            raise HTTPException(status_code=422, detail="Body must be a JSON array")
+        if len(raw) > max_size:
+            raise HTTPException(status_code=413, detail=f"Batch larger than {max_size} items")
+
+    # Fast path: every (decoded) element is valid
+    candidates = [index for index in range(len(raw)) if index not in errors]
+    try:
+        models = adapter.validate_python([raw[index] for index in candidates] if errors else raw)
+    except ValidationError as exc:
+        for err in exc.errors():
+            index = candidates[err["loc"][0]]
+            errors.setdefault(index, []).append(
+                {"loc": list(err["loc"][1:]), "msg": err["msg"], "type": err["type"]}
+            )
+    else:
+        return list(zip(candidates, models)), errors
+
+    # Slow path: validate again without the invalid elements
+    good = [index for index in candidates if index not in errors]
+    models = adapter.validate_python([raw[index] for index in good]) if good else []
+    return list(zip(good, models)), errors
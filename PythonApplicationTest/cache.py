@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from fastapi import Request
+from fastapi.dependencies.utils import get_flat_dependant
+from fastapi.routing import APIRoute
+from typing import Any, Hashable
+from urllib.parse import urlencode
+import threading
+import time
+
+
+# Bounded TTL + LRU cache
+## Entries can carry a tag (e.g. an item_id) so every cached variant of a
+## resource can be dropped at once with invalidate(tag).
+## The lock is uncontended on the event loop; it is there because store
+## listeners may invalidate from the maintenance thread.
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._entries: OrderedDict[Hashable, tuple[float, Any, Hashable]] = OrderedDict()
+        self._tags: dict[Hashable, set] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires, value, tag = entry
+            if expires <= self.timer():
+                self._remove(key, tag)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, tag: Hashable = None):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._untag(key, old[2])
+            self._entries[key] = (self.timer() + self.ttl, value, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, (_, _, old_tag) = self._entries.popitem(last=False)
+                self._untag(old_key, old_tag)
+                self.evictions += 1
+
+    def invalidate(self, tag: Hashable) -> int:
+        with self._lock:
+            keys = self._tags.pop(tag, ())
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Hashable, tag: Hashable):
+        del self._entries[key]
+        self._untag(key, tag)
+
+    def _untag(self, key: Hashable, tag: Hashable):
+        if tag is None:
+            return
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+
+# Cache key dependency for GET routes
+## Path plus the query params the route declares, sorted by name, using the
+## names as sent (aliases such as `item-query` included), so equivalent URLs
+## share an entry. Undeclared params are left out: the response doesn't depend
+## on them, and a random `?x=` per request would otherwise fill the cache with
+## copies that push out the hot entries. Async (it never awaits) so FastAPI
+## calls it on the event loop instead of sending it to the threadpool.
+
+_declared_query_params: dict[int, frozenset[str]] = {}  # by id(route): routes aren't hashable
+
+
+def _declared(route: APIRoute) -> frozenset[str]:
+    names = _declared_query_params.get(id(route))
+    if names is None:
+        names = _declared_query_params[id(route)] = frozenset(
+            param.alias for param in get_flat_dependant(route.dependant).query_params
+        )
+    return names
+
+
+async def request_cache_key(request: Request) -> str:
+    route = request.scope.get("route")
+    declared = _declared(route) if isinstance(route, APIRoute) else frozenset()
+    query = sorted((name, value) for name, value in request.query_params.multi_items() if name in declared)
+    if not query:
+        return request.url.path
+    return f"{request.url.path}?{urlencode(query)}"
@@ -0,0 +1,73 @@
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+import asyncio
+import functools
+
+T = TypeVar("T")
+
+
+# Single-flight request coalescing
+## Concurrent calls with the same key share one in-flight computation: the
+## first call starts it, the others wait for it and all get its result or its
+## exception. Nothing is cached; once the computation finishes the next call
+## starts a new one.
+## The computation runs as its own task, so a caller being cancelled (client
+## gone) doesn't cancel it for the others. A caller that has waited
+## `max_wait` seconds stops waiting and runs the call itself.
+##
+## flight = SingleFlight(max_wait=2.0)
+##
+## @flight.coalesce(key=lambda job_id: job_id)
+## async def load_job(job_id: int) -> dict: ...
+##
+## The decorated function keeps its signature, so it also works as a FastAPI
+## dependency: Annotated[dict, Depends(load_job)].
+
+class SingleFlight:
+    def __init__(self, max_wait: float | None = None):
+        self.max_wait = max_wait
+        self._flights: dict[Hashable, asyncio.Task] = {}
+
+        self.calls = 0      # computations actually run
+        self.collapsed = 0  # callers served by another caller's computation
+        self.timeouts = 0   # callers that gave up waiting and ran their own
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = self._flights[key] = asyncio.ensure_future(fn())
+            flight.add_done_callback(functools.partial(self._landed, key))
+            return await asyncio.shield(flight)
+
+        self.collapsed += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight), self.max_wait)
+        except asyncio.TimeoutError:
+            if flight.done():
+                raise  # the shared computation itself timed out
+            self.collapsed -= 1
+            self.timeouts += 1
+            self.calls += 1
+            return await fn()
+
+    def _landed(self, key: Hashable, flight: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            flight.exception()  # retrieved here in case every caller went away
+
+    def coalesce(self, key: Callable[..., Hashable]):
+        def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+            @functools.wraps(fn)
+            async def wrapper(*args: Any, **kwargs: Any) -> T:
+                return await self.do(key(*args, **kwargs), lambda: fn(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "timeouts": self.timeouts,
+        }
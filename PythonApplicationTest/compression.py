@@ -0,0 +1,210 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Streaming encoders
+## Each exposes compress(chunk) -> bytes and flush() -> bytes (final block)
+
+class _ZlibEncoder:
+    def __init__(self, level: int, wbits: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Server preference order, used to break ties between equal q-values
+def available_encoders(gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3) -> dict:
+    encoders = {}
+    if zstandard is not None:
+        encoders["zstd"] = lambda: _ZstdEncoder(zstd_level)
+    if brotli is not None:
+        encoders["br"] = lambda: _BrotliEncoder(brotli_quality)
+    encoders["gzip"] = lambda: _ZlibEncoder(gzip_level, 16 + zlib.MAX_WBITS)
+    encoders["deflate"] = lambda: _ZlibEncoder(gzip_level, zlib.MAX_WBITS)
+    return encoders
+
+
+# Pick the best encoding from an Accept-Encoding header, or None for identity
+def negotiate(accept_encoding: str, supported) -> str | None:
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip()] = q
+
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+# Already-compressed payloads gain nothing from another pass
+COMPRESSED_CONTENT_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/zstd",
+    "application/pdf",
+    "text/event-stream",  # must reach the client unbuffered
+)
+COMPRESSIBLE_EXCEPTIONS = ("image/svg+xml",)
+
+
+# Response compression middleware
+## app.add_middleware(CompressionMiddleware, minimum_size=500)
+## Complete bodies under minimum_size go out untouched; streamed bodies
+## (StreamingResponse) are compressed chunk by chunk as they are sent.
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = available_encoders(gzip_level, brotli_quality, zstd_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encoders)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.encoders[encoding], self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, make_encoder, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.make_encoder = make_encoder
+        self.minimum_size = minimum_size
+        self.start_message: Message | None = None
+        self.encoder = None
+        self.passthrough = False
+
+    def _should_skip(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return True
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith(COMPRESSIBLE_EXCEPTIONS):
+            return False
+        return content_type.startswith(COMPRESSED_CONTENT_TYPES)
+
+    def _start_compressing(self, headers: MutableHeaders):
+        self.encoder = self.make_encoder()
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # The encoded bytes differ from what a strong ETag was computed over
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    async def send(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            self.passthrough = self._should_skip(Headers(raw=message["headers"]))
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            if self.start_message is not None:
+                await self._send(self.start_message)
+                self.start_message = None
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            # First body chunk: decide now, before the headers go out
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+            elif not more_body:
+                self._start_compressing(headers)
+                body = self.encoder.compress(body) + self.encoder.flush()
+                headers["Content-Length"] = str(len(body))
+                message["body"] = body
+            else:
+                self._start_compressing(headers)
+                del headers["Content-Length"]
+                message["body"] = self.encoder.compress(body)
+            await self._send(self.start_message)
+            self.start_message = None
+            await self._send(message)
+            return
+
+        # Later chunks of a streamed body
+        body = self.encoder.compress(body)
+        if not more_body:
+            body += self.encoder.flush()
+        elif not body:
+            return  # the encoder is still buffering; nothing to send yet
+        message["body"] = body
+        await self._send(message)
@@ -0,0 +1,147 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
+import asyncio
+import os
+import time
+
+import aiosqlite
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Bounded async connection pool
+## Connections are opened lazily up to `size` and then reused, so requests
+## stop paying a connection handshake each. When all are busy, acquire()
+## waits up to `timeout` seconds and raises PoolTimeout.
+## Any driver works: `connect` is an async factory returning a connection
+## with an async close().
+
+class ConnectionPool:
+    def __init__(self, connect: Callable[[], Awaitable[Any]], size: int = 5, timeout: float = 5.0):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle: asyncio.LifoQueue = asyncio.LifoQueue()
+        self._opened = 0
+
+        self.in_use = 0
+        self.waiting = 0
+        self.acquisitions = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self) -> Any:
+        self.acquisitions += 1
+        if self._idle.empty() and self._opened < self.size:
+            self._opened += 1
+            try:
+                conn = await self.connect()
+            except BaseException:
+                self._opened -= 1
+                raise
+        elif not self._idle.empty():
+            conn = self._idle.get_nowait()
+        else:
+            self.waits += 1
+            self.waiting += 1
+            start = time.perf_counter()
+            try:
+                conn = await asyncio.wait_for(self._idle.get(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise PoolTimeout(f"No database connection free after {self.timeout}s")
+            finally:
+                self.waiting -= 1
+                self.wait_seconds += time.perf_counter() - start
+        self.in_use += 1
+        return conn
+
+    def release(self, conn: Any):
+        self.in_use -= 1
+        self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Any]:
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+            self._opened -= 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "opened": self._opened,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "acquisitions": self.acquisitions,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait_seconds,
+        }
+
+
+# SQLite driver (aiosqlite)
+def sqlite_connect(path: str) -> Callable[[], Awaitable[aiosqlite.Connection]]:
+    async def connect() -> aiosqlite.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = await aiosqlite.connect(path)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    return connect
+
+
+# Tables for the UserInDB model (items live in the log-structured ItemStore)
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        email TEXT NOT NULL,
+        full_name TEXT,
+        hashed_password TEXT NOT NULL
+    )
+    """,
+)
+
+
+async def init_schema(pool: ConnectionPool):
+    async with pool.connection() as conn:
+        for statement in SCHEMA:
+            await conn.execute(statement)
+        await conn.commit()
+
+
+# Repository: plain dicts in and out, one pooled connection each
+
+class UserRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def get(self, username: str) -> dict | None:
+        async with self.conn.execute(
+            "SELECT username, email, full_name, hashed_password FROM users WHERE username = ?", (username,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return dict(row) if row is not None else None
+
+    async def create(self, user: dict) -> bool:
+        # False when the username is already taken
+        cursor = await self.conn.execute(
+            "INSERT OR IGNORE INTO users (username, email, full_name, hashed_password) VALUES (?, ?, ?, ?)",
+            (user["username"], user["email"], user["full_name"], user["hashed_password"]),
+        )
+        await self.conn.commit()
+        return cursor.rowcount == 1
@@ -0,0 +1,77 @@
+from email.utils import formatdate, parsedate_to_datetime
+from starlette.requests import Request
+
+# ETags naming an item version
+## Tags are the quoted store version ("42"). They identify a version of the
+## item rather than exact bytes, so a W/ prefix (added when the compression
+## middleware re-encodes a response) doesn't change what a tag refers to.
+
+def make_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def parse_etags(header: str) -> list[str]:
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+# If-Match: "*" matches any existing item, otherwise one of the listed tags must
+def if_match(header: str, version: int | None) -> bool:
+    if version is None:
+        return False
+    tags = parse_etags(header)
+    return "*" in tags or make_etag(version) in tags
+
+
+# If-None-Match uses the weak comparison, so W/"42" matches "42" too
+def if_none_match(header: str, etag: str) -> bool:
+    tags = parse_etags(header)
+    return "*" in tags or etag in tags
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+# Validators and caching headers for one route
+## cache_control is sent as is ("no-cache" by default: clients may keep the
+## body but must revalidate, which is a cheap 304 while nothing changed);
+## None leaves Cache-Control out. last_modified=False omits Last-Modified and
+## ignores If-Modified-Since.
+##
+## headers = policy.headers(etag, modified)
+## if policy.not_modified(request, etag, modified):
+##     return Response(status_code=304, headers=headers)
+
+class CachePolicy:
+    def __init__(self, cache_control: str | None = "no-cache", last_modified: bool = True):
+        self.cache_control = cache_control
+        self.last_modified = last_modified
+
+    def headers(self, etag: str, modified: float | None = None) -> dict[str, str]:
+        headers = {"ETag": etag}
+        if self.last_modified and modified is not None:
+            headers["Last-Modified"] = http_date(modified)
+        if self.cache_control:
+            headers["Cache-Control"] = self.cache_control
+        return headers
+
+    # If-None-Match takes precedence; If-Modified-Since only counts without it
+    def not_modified(self, request: Request, etag: str, modified: float | None = None) -> bool:
+        header = request.headers.get("if-none-match")
+        if header is not None:
+            return if_none_match(header, etag)
+        header = request.headers.get("if-modified-since")
+        if header is None or not self.last_modified or modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(header).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(modified) <= since
@@ -0,0 +1,48 @@
+from typing import AsyncIterator
+import asyncio
+import csv
+import io
+
+from item_store import ItemStore
+from responses import json_dumps
+
+EXPORT_PAGE_SIZE = 1000
+CSV_COLUMNS = ["item_id", "name", "description", "price", "tax", "tags"]  # tags as a JSON array
+
+
+# Streamed item exports
+## Walk the store in item_id order one page at a time, so memory stays at one
+## page however big the store is. Each page is yielded as a single chunk;
+## StreamingResponse awaits the send of every chunk, so a slow client holds
+## the generator back (backpressure) instead of buffering rows server side.
+
+async def export_ndjson(store: ItemStore, after: int | None, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[bytes]:
+    while item_ids := store.ids_after(after, page_size):
+        lines = []
+        for item_id in item_ids:
+            data = store.get(item_id)
+            if data is not None:  # deleted while we were paging
+                lines.append(json_dumps({"item_id": item_id, **data.to_dict()}))
+        lines.append(b"")
+        yield b"\n".join(lines)
+        after = item_ids[-1]
+        await asyncio.sleep(0)
+
+
+async def export_csv(store: ItemStore, after: int | None, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    while item_ids := store.ids_after(after, page_size):
+        for item_id in item_ids:
+            data = store.get(item_id)
+            if data is not None:
+                writer.writerow([
+                    item_id, data["name"], data["description"], data["price"], data["tax"],
+                    json_dumps(data.get("tags") or []).decode(),
+                ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        after = item_ids[-1]
+        await asyncio.sleep(0)
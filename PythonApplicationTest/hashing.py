@@ -0,0 +1,115 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+
+# Production cost factors: tens to hundreds of ms of CPU per hash
+SCRYPT_N = 2**15
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600_000
+
+
+# KDFs
+## Module-level functions so they can be pickled to the worker processes.
+## Hashes are self-describing: "<algorithm>$<params>$<salt>$<digest>".
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode()
+
+
+def hash_password(raw_password: str, algorithm: str = "scrypt") -> str:
+    salt = os.urandom(16)
+    if algorithm == "scrypt":
+        digest = hashlib.scrypt(
+            raw_password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+            maxmem=256 * SCRYPT_N * SCRYPT_R, dklen=32,
+        )
+        return f"scrypt${SCRYPT_N},{SCRYPT_R},{SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    if algorithm == "pbkdf2_sha256":
+        digest = hashlib.pbkdf2_hmac("sha256", raw_password.encode(), salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+
+def verify_password(raw_password: str, hashed_password: str) -> bool:
+    try:
+        algorithm, params, salt, expected = hashed_password.split("$")
+        salt = base64.b64decode(salt)
+        expected = base64.b64decode(expected)
+    except ValueError:
+        return False
+    if algorithm == "scrypt":
+        n, r, p = (int(value) for value in params.split(","))
+        digest = hashlib.scrypt(
+            raw_password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=len(expected)
+        )
+    elif algorithm == "pbkdf2_sha256":
+        digest = hashlib.pbkdf2_hmac("sha256", raw_password.encode(), salt, int(params))
+    else:
+        return False
+    return hmac.compare_digest(digest, expected)
+
+
+class HasherBusy(Exception):
+    pass
+
+
+# Password hashing off the event loop
+## Hashes run on a bounded ProcessPoolExecutor, so a signup storm costs the
+## event loop one future per request instead of the KDF's CPU time.
+## At most `max_pending` calls may be queued or running; past that calls
+## fail fast with HasherBusy so the route can shed load (503).
+## A worker that dies (OOM kill, crash) breaks the whole pool: the calls it
+## took down fail with HasherBusy too, and the next call starts a new pool.
+
+class PasswordHasher:
+    def __init__(self, workers: int | None = None, max_pending: int | None = None, algorithm: str = "scrypt"):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_pending = max_pending or self.workers * 8
+        self.algorithm = algorithm
+        self.pending = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    def start(self):
+        if self._executor is None:
+            # spawn: don't fork a process that already runs threads (log listener)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def hash(self, raw_password: str) -> str:
+        return await self._submit(hash_password, raw_password, self.algorithm)
+
+    async def verify(self, raw_password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, raw_password, hashed_password)
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HasherBusy(f"{self.pending} password hashes already pending")
+        self.start()
+        executor = self._executor
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # Every call on the broken pool gets here: only the first replaces it
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise HasherBusy("password hasher worker died, pool restarted") from None
+        finally:
+            self.pending -= 1
@@ -0,0 +1,328 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from pydantic import BaseModel, Field
+from itertools import islice
+from typing import Callable, Iterator, Literal
+import heapq
+import math
+import threading
+
+from item_store import ItemRecord, ItemStore
+from pagination import MAX_PAGE_SIZE
+
+BUCKET_SIZE = 1000
+
+# A position in a SortedIndex: (bucket, offset within the bucket)
+Position = tuple[int, int]
+
+
+# Query parameters for GET /items/filter
+## Tags must all be present on an item; price and creation time are inclusive
+## ranges. Results are ordered by order_by (ties by item_id).
+
+class FilterParams(BaseModel):
+    limit: int = Field(100, gt=0, le=MAX_PAGE_SIZE)
+    offset: int = Field(0, ge=0)
+    order_by: Literal["created_at", "updated_at", "price"] = "created_at"
+    tags: list[str] = []
+    min_price: float | None = None
+    max_price: float | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+
+    def ranges(self) -> dict[str, tuple[float, float]]:
+        ranges = {}
+        if self.min_price is not None or self.max_price is not None:
+            ranges["price"] = (
+                -math.inf if self.min_price is None else self.min_price,
+                math.inf if self.max_price is None else self.max_price,
+            )
+        if self.created_after is not None or self.created_before is not None:
+            ranges["created_at"] = (
+                -math.inf if self.created_after is None else self.created_after.timestamp(),
+                math.inf if self.created_before is None else self.created_before.timestamp(),
+            )
+        return ranges
+
+
+# Ordered index on one numeric key
+## `keys` maps item_id -> key; the (key, item_id) pairs are also kept in order,
+## split into buckets of about BUCKET_SIZE so an insert or remove shifts one
+## small list rather than the whole index.
+## The ordered part is built on first use. A burst of more than
+## `rebuild_after` writes with no query in between (log replay, a big batch,
+## catching up after another worker compacted) drops it instead of updating
+## it pair by pair; the next query rebuilds it with one sort.
+
+class SortedIndex:
+    def __init__(self, rebuild_after: int = 10000):
+        self.rebuild_after = rebuild_after
+        self.keys: dict[int, float] = {}
+        self._bucket_keys: list[list[float]] = []
+        self._bucket_ids: list[list[int]] = []
+        self._maxes: list[tuple[float, int]] = []  # last pair of every bucket
+        self._built = False
+        self._writes = 0
+        self.rebuilds = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def set(self, item_id: int, key: float):
+        old = self.keys.get(item_id)
+        if old == key:
+            return
+        self.keys[item_id] = key
+        if self._track_write():
+            if old is not None:
+                self._remove(old, item_id)
+            self._insert(key, item_id)
+
+    def discard(self, item_id: int):
+        old = self.keys.pop(item_id, None)
+        if old is not None and self._track_write():
+            self._remove(old, item_id)
+
+    def ensure(self):
+        self._writes = 0
+        if self._built:
+            return
+        item_ids = sorted(self.keys)
+        item_ids.sort(key=self.keys.__getitem__)  # stable: ties stay in item_id order
+        keys = list(map(self.keys.__getitem__, item_ids))
+        self._bucket_keys = [keys[i : i + BUCKET_SIZE] for i in range(0, len(keys), BUCKET_SIZE)]
+        self._bucket_ids = [item_ids[i : i + BUCKET_SIZE] for i in range(0, len(item_ids), BUCKET_SIZE)]
+        self._maxes = [(keys[-1], item_ids[-1]) for keys, item_ids in zip(self._bucket_keys, self._bucket_ids)]
+        self._built = True
+        self.rebuilds += 1
+
+    # Range reads (call ensure() first)
+
+    def bounds(self, lo: float = -math.inf, hi: float = math.inf) -> tuple[Position, Position]:
+        return self._locate(lo, -math.inf), self._locate(hi, math.inf)
+
+    def count(self, start: Position, end: Position) -> int:
+        (start_bucket, start_offset), (end_bucket, end_offset) = start, end
+        if start_bucket == end_bucket:
+            return end_offset - start_offset
+        middle = sum(map(len, self._bucket_ids[start_bucket + 1 : end_bucket]))
+        return len(self._bucket_ids[start_bucket]) - start_offset + middle + end_offset
+
+    def iter_ids(self, start: Position, end: Position, skip: int = 0) -> Iterator[int]:
+        (start_bucket, offset), (end_bucket, end_offset) = start, end
+        for bucket in range(start_bucket, min(end_bucket + 1, len(self._bucket_ids))):
+            item_ids = self._bucket_ids[bucket]
+            stop = end_offset if bucket == end_bucket else len(item_ids)
+            if skip >= stop - offset:  # whole bucket skipped
+                skip -= stop - offset
+            else:
+                yield from item_ids[offset + skip : stop]
+                skip = 0
+            offset = 0
+
+    # Internals
+
+    def _track_write(self) -> bool:
+        # Whether the ordered part should follow this write
+        if not self._built:
+            return False
+        self._writes += 1
+        if self._writes > self.rebuild_after:
+            self._built = False
+            self._bucket_keys, self._bucket_ids, self._maxes = [], [], []
+            return False
+        return True
+
+    @staticmethod
+    def _offset(keys: list[float], item_ids: list[int], key: float, item_id: float) -> int:
+        lo = bisect_left(keys, key)
+        hi = bisect_right(keys, key, lo)
+        return bisect_left(item_ids, item_id, lo, hi)
+
+    def _locate(self, key: float, item_id: float) -> Position:
+        # Position of the first pair >= (key, item_id)
+        bucket = bisect_left(self._maxes, (key, item_id))
+        if bucket == len(self._maxes):
+            return bucket, 0
+        return bucket, self._offset(self._bucket_keys[bucket], self._bucket_ids[bucket], key, item_id)
+
+    def _insert(self, key: float, item_id: int):
+        if not self._maxes:
+            self._bucket_keys.append([key])
+            self._bucket_ids.append([item_id])
+            self._maxes.append((key, item_id))
+            return
+        bucket = min(bisect_left(self._maxes, (key, item_id)), len(self._maxes) - 1)
+        keys, item_ids = self._bucket_keys[bucket], self._bucket_ids[bucket]
+        offset = self._offset(keys, item_ids, key, item_id)
+        keys.insert(offset, key)
+        item_ids.insert(offset, item_id)
+        if offset == len(keys) - 1:
+            self._maxes[bucket] = (key, item_id)
+        if len(keys) > 2 * BUCKET_SIZE:
+            self._bucket_keys[bucket : bucket + 1] = [keys[:BUCKET_SIZE], keys[BUCKET_SIZE:]]
+            self._bucket_ids[bucket : bucket + 1] = [item_ids[:BUCKET_SIZE], item_ids[BUCKET_SIZE:]]
+            self._maxes.insert(bucket, (keys[BUCKET_SIZE - 1], item_ids[BUCKET_SIZE - 1]))
+
+    def _remove(self, key: float, item_id: int):
+        bucket = bisect_left(self._maxes, (key, item_id))
+        keys, item_ids = self._bucket_keys[bucket], self._bucket_ids[bucket]
+        offset = self._offset(keys, item_ids, key, item_id)
+        del keys[offset]
+        del item_ids[offset]
+        if not keys:
+            del self._bucket_keys[bucket], self._bucket_ids[bucket], self._maxes[bucket]
+        elif offset == len(keys):
+            self._maxes[bucket] = (keys[-1], item_ids[-1])
+
+
+# Inverted index: tag -> ids of the items carrying it
+class TagIndex:
+    def __init__(self):
+        self.postings: dict[str, set[int]] = {}
+        self._item_tags: dict[int, frozenset[str]] = {}
+
+    def get(self, tag: str) -> set[int]:
+        return self.postings.get(tag, set())
+
+    def set(self, item_id: int, tags: list[str]):
+        new = frozenset(tags)
+        old = self._item_tags.get(item_id, frozenset())
+        if new == old:
+            return
+        for tag in old - new:
+            self._unpost(tag, item_id)
+        for tag in new - old:
+            self.postings.setdefault(tag, set()).add(item_id)
+        if new:
+            self._item_tags[item_id] = new
+        else:
+            self._item_tags.pop(item_id, None)
+
+    def discard(self, item_id: int):
+        for tag in self._item_tags.pop(item_id, ()):
+            self._unpost(tag, item_id)
+
+    def _unpost(self, tag: str, item_id: int):
+        posting = self.postings[tag]
+        posting.discard(item_id)
+        if not posting:
+            del self.postings[tag]
+
+
+# Secondary indexes over an ItemStore, kept in sync through its listeners
+## Sorted indexes on price, created_at and updated_at (from the store
+## records) and an inverted index on tags. query() plans a FilterParams
+## request from exact match counts, which every index gives cheaply:
+## - ordered walk: go through the order_by index (or its range, when the
+##   filter bounds that field) testing the other filters, and stop at
+##   offset + limit matches. Chosen when matches are expected early.
+## - lookup: start from the most selective filter (smallest tag posting or
+##   range), intersect it with the other tag postings smallest first, check
+##   the remaining ranges, and keep the first offset + limit by order_by
+##   with a heap instead of sorting every match.
+## Listeners may run on the store maintenance thread, hence the lock.
+
+class ItemIndexes:
+    def __init__(self, store: ItemStore, rebuild_after: int = 10000):
+        self.store = store
+        self.sorted = {name: SortedIndex(rebuild_after) for name in ("price", "created_at", "updated_at")}
+        self.tags = TagIndex()
+        self._lock = threading.Lock()
+
+        self.walks = 0
+        self.lookups = 0
+
+        store.subscribe(self._on_write)
+
+    def _on_write(self, item_id: int, data: ItemRecord | None):
+        with self._lock:
+            if data is None:
+                for index in self.sorted.values():
+                    index.discard(item_id)
+                self.tags.discard(item_id)
+                return
+            created = data.created or 0.0  # unknown in logs from before timestamps
+            self.sorted["created_at"].set(item_id, created)
+            self.sorted["updated_at"].set(item_id, data.modified or created)
+            price = data.get("price")
+            if isinstance(price, (int, float)):
+                self.sorted["price"].set(item_id, price)
+            else:
+                self.sorted["price"].discard(item_id)
+            self.tags.set(item_id, data.get("tags") or ())
+
+    def query(self, filters: FilterParams) -> list[int]:
+        with self._lock:
+            return self._query(filters)
+
+    def _query(self, filters: FilterParams) -> list[int]:
+        want = filters.offset + filters.limit
+        ranges = filters.ranges()
+        order = self.sorted[filters.order_by]
+        for name in {filters.order_by, *ranges}:
+            self.sorted[name].ensure()
+
+        postings = sorted((self.tags.get(tag) for tag in set(filters.tags)), key=len)
+        if postings and not postings[0]:
+            return []
+
+        # Exact number of items matching each filter on its own
+        bounds = {name: self.sorted[name].bounds(lo, hi) for name, (lo, hi) in ranges.items()}
+        span = bounds.pop(filters.order_by, None) or order.bounds()
+        span_size = order.count(*span)
+        counts = {name: self.sorted[name].count(*bounds[name]) for name in bounds}
+        if span_size == 0 or 0 in counts.values():
+            return []
+        if not postings and not counts:
+            self.walks += 1
+            return list(islice(order.iter_ids(*span, skip=filters.offset), filters.limit))
+
+        # Smallest posting or range other than the one on order_by
+        range_name = min(counts, key=counts.__getitem__, default=None)
+        if range_name is not None and (not postings or counts[range_name] < len(postings[0])):
+            best_size = counts[range_name]
+        else:
+            best_size, range_name = len(postings[0]), None
+
+        # Matches are spread over the walked span at about best_size / span_size
+        # (assuming independent filters), so the walk visits about this many
+        walk_cost = min(span_size, want * span_size / best_size)
+        if walk_cost <= best_size:
+            self.walks += 1
+            candidates = order.iter_ids(*span)
+            checks = sorted(counts, key=counts.__getitem__)
+        else:
+            self.lookups += 1
+            if range_name is None:
+                candidates = postings[0].intersection(*postings[1:])
+                postings = []
+            else:
+                candidates = self.sorted[range_name].iter_ids(*bounds[range_name])
+            checks = sorted((name for name in ranges if name != range_name), key=lambda name: counts.get(name, span_size))
+
+        # Most selective filter first; the set lookups run at C speed
+        for posting in postings:
+            candidates = filter(posting.__contains__, candidates)
+        for name in checks:
+            candidates = filter(self._in_range(name, *ranges[name]), candidates)
+        if walk_cost <= best_size:
+            return list(islice(candidates, filters.offset, want))
+
+        # Ties on the order_by key are broken by item_id, as in the ordered walk
+        keys = order.keys
+        candidates = filter(keys.__contains__, candidates)
+        return heapq.nsmallest(want, candidates, key=lambda item_id: (keys[item_id], item_id))[filters.offset :]
+
+    def _in_range(self, name: str, lo: float, hi: float) -> Callable[[int], bool]:
+        keys = self.sorted[name].keys
+        return lambda item_id: lo <= keys.get(item_id, math.nan) <= hi
+
+    def stats(self) -> dict:
+        return {
+            "items": len(self.sorted["created_at"]),
+            "tags": len(self.tags.postings),
+            "walks": self.walks,
+            "lookups": self.lookups,
+            "rebuilds": sum(index.rebuilds for index in self.sorted.values()),
+        }
@@ -0,0 +1,517 @@
+from abc import abstractmethod
+from bisect import bisect_right, insort
+from collections.abc import Mapping
+from contextlib import contextmanager
+from operator import attrgetter
+from typing import Any, Callable, Iterator
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: single worker, the in-process lock is enough
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Largest item id: JSON clients (JavaScript numbers) read ids up to 2**53 exactly
+MAX_ITEM_ID = 2**53 - 1
+
+
+class VersionConflict(Exception):
+    def __init__(self, item_id: int, version: int | None):
+        super().__init__(f"Item {item_id} is at version {version}")
+        self.item_id = item_id
+        self.version = version
+
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+# Stored form of a value: a list of scalars (tags) becomes a tuple with its
+# strings interned, as the same few tags repeat across items; reads get a list
+def _freeze(value: Any) -> Any:
+    if type(value) is list and all(type(element) in _SCALARS for element in value):
+        return tuple([sys.intern(element) if type(element) is str else element for element in value])
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    return list(value) if type(value) is tuple else value
+
+
+# A stored item: its data plus the version of its latest write and when it was
+# created / last modified (time.time(); None in old logs)
+## The data is read as a Mapping ({**record}, record["price"], record.get(...))
+## and only turned into a dict where one is needed, when rendering a response
+## or writing the log (to_dict()). Every write stores a new record instead of
+## modifying the old one, so a reader holding a record keeps a consistent item.
+## Values live in __slots__ of a class generated per field layout (the tuple of
+## keys, in order), so field names are kept once per layout, not per item and
+## there is no per-item dict. Past MAX_LAYOUTS layouts (data with arbitrary
+## keys) records hold a plain dict instead.
+
+class ItemRecord(Mapping):
+    __slots__ = ("version", "created", "modified")
+
+    @abstractmethod
+    def to_dict(self) -> dict:
+        ...
+
+    def __repr__(self) -> str:
+        return f"ItemRecord({self.to_dict()!r}, version={self.version})"
+
+
+class _SlottedRecord(ItemRecord):
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+    _getters: dict[str, Callable[["_SlottedRecord"], Any]] = {}
+    _values: Callable[["_SlottedRecord"], tuple]
+
+    def __getitem__(self, key: str) -> Any:
+        getter = self._getters.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return _thaw(getter(self))
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._getters
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._fields, map(_thaw, self._values(self))))
+
+
+class _DictRecord(ItemRecord):
+    __slots__ = ("_data",)
+
+    def __getitem__(self, key: str) -> Any:
+        return _thaw(self._data[key])
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def to_dict(self) -> dict:
+        return {key: _thaw(value) for key, value in self._data.items()}
+
+
+# All slot values of a record as a tuple (attrgetter of a single name returns
+# just the value)
+def _values_getter(slots: tuple[str, ...]) -> Callable[["_SlottedRecord"], tuple]:
+    if len(slots) > 1:
+        return attrgetter(*slots)
+    if slots:
+        get = attrgetter(slots[0])
+        return staticmethod(lambda record: (get(record),))
+    return staticmethod(lambda record: ())
+
+
+MAX_LAYOUTS = 256
+_layouts: dict[tuple[str, ...], type[_SlottedRecord]] = {}
+
+
+def _layout(fields: tuple[str, ...]) -> type[_SlottedRecord] | None:
+    layout = _layouts.get(fields)
+    if layout is None and len(_layouts) < MAX_LAYOUTS:
+        slots = tuple(f"_{i}" for i in range(len(fields)))
+        layout = _layouts[fields] = type("ItemRecord", (_SlottedRecord,), {
+            "__slots__": slots,
+            "_fields": fields,
+            "_getters": {field: attrgetter(slot) for field, slot in zip(fields, slots)},
+            "_values": _values_getter(slots),
+        })
+    return layout
+
+
+def make_record(data: dict, version: int, created: float | None, modified: float | None) -> ItemRecord:
+    layout = _layout(tuple(data))
+    if layout is None:
+        record = _DictRecord()
+        record._data = {key: _freeze(value) for key, value in data.items()}
+    else:
+        record = layout()
+        for slot, value in zip(layout.__slots__, data.values()):
+            setattr(record, slot, _freeze(value))
+    record.version = version
+    record.created = created
+    record.modified = modified
+    return record
+
+
+# Log-structured item store
+## Every write is appended to a JSON-lines log; the in-memory hash index maps
+## item_id -> stored item so point reads never touch the disk.
+## On open the log is replayed (crash recovery), and compaction rewrites it
+## with only the live records once enough of it is dead.
+## Workers sharing the same log serialize writes through an advisory lock file
+## and catch up with each other's appends via refresh(); stale() tells cheaply
+## whether there is anything to catch up with.
+## Listeners registered with subscribe() are called as listener(item_id, data)
+## after every applied write, local or replayed; data is None for deletes.
+## Every write is stamped with the next value of a store-wide sequence, which
+## becomes the item's version: versions only grow, so a version never repeats
+## for an item, even across a delete. update() writes only the changed fields
+## and can be made conditional on the version the caller last saw.
+## Writes also record their time, kept per item as created / modified.
+## Items are held as compact ItemRecords (no per-item dict), read as Mappings.
+
+class ItemStore:
+    def __init__(
+        self,
+        path: str,
+        compact_min_records: int = 1000,
+        compact_dead_ratio: float = 0.5,
+        fsync: bool = False,
+    ):
+        self.path = path
+        self.compact_min_records = compact_min_records
+        self.compact_dead_ratio = compact_dead_ratio
+        self.fsync = fsync
+
+        self._index: dict[int, ItemRecord] = {}
+        self._seq = 0  # version of the latest write
+        self._modified: float | None = None  # time of the latest write
+        self._ids: list[int] = []  # sorted item ids, for keyset pagination
+        self._next_id = 1
+        self._records = 0  # lines in the log, live or dead
+        self._offset = 0   # how far into the log this process has replayed
+        self._log = None
+        self._inode = None  # of the log file this process has open
+        self._lock = threading.RLock()
+        self._listeners: list[Callable[[int, ItemRecord | None], None]] = []
+
+    # Lifecycle
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, self._file_lock():
+            self._reopen()
+            self._replay()
+
+    def subscribe(self, listener: Callable[[int, ItemRecord | None], None]):
+        self._listeners.append(listener)
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    # Reads
+
+    def get(self, item_id: int) -> ItemRecord | None:
+        return self._index.get(item_id)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # The record carries the version and times too; meta() reads only those
+    def meta(self, item_id: int) -> ItemRecord | None:
+        return self._index.get(item_id)
+
+    def version(self, item_id: int) -> int | None:
+        record = self._index.get(item_id)
+        return record.version if record is not None else None
+
+    # Whether other workers wrote since the last catch-up (one stat, no
+    # locks, so it can be checked on every read); refresh() applies them
+    def stale(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != self._inode or stat.st_size != self._offset
+
+    # Version and time of the latest write to any item (collection validators)
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    @property
+    def modified(self) -> float | None:
+        return self._modified
+
+    # Up to `limit` item ids greater than `after_id`, in ascending order
+    def ids_after(self, after_id: int | None, limit: int) -> list[int]:
+        start = 0 if after_id is None else bisect_right(self._ids, after_id)
+        return self._ids[start : start + limit]
+
+    # Writes
+
+    def create(self, data: dict) -> tuple[int, dict]:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            item_id = self._next_id
+            version, now = self._seq + 1, self._now()
+            self._append({"op": "put", "id": item_id, "data": data, "v": version, "t": now})
+            self._apply_put(item_id, data, version, now)
+        return item_id, data
+
+    # Replaces an existing item; returns None if there is no such item.
+    # Item ids are only ever allocated by create(), so a client can't pick one.
+    def put(self, item_id: int, data: dict) -> dict | None:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            if item_id not in self._index:
+                return None
+            version, now = self._seq + 1, self._now()
+            self._append({"op": "put", "id": item_id, "data": data, "v": version, "t": now})
+            self._apply_put(item_id, data, version, now)
+        return data
+
+    # Partial update: logs and applies only `changes` (top-level fields).
+    # Returns the new item and its version, or None if there is no such item;
+    # with expected_version, raises VersionConflict unless the item is still
+    # at that version (checked after catching up with other workers).
+    def update(self, item_id: int, changes: dict, expected_version: int | None = None) -> tuple[dict, int] | None:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            current = self._index.get(item_id)
+            if current is None:
+                return None
+            if expected_version is not None and current.version != expected_version:
+                raise VersionConflict(item_id, current.version)
+            version, now = self._seq + 1, self._now()
+            self._append({"op": "patch", "id": item_id, "data": changes, "v": version, "t": now})
+            data = {**current, **changes}
+            self._apply_put(item_id, data, version, now)
+        return data, version
+
+    # Batched writes: one lock acquisition and one write() for the whole batch
+
+    def create_many(self, datas: list[dict]) -> list[int]:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            item_ids = list(range(self._next_id, self._next_id + len(datas)))
+            versions, now = range(self._seq + 1, self._seq + 1 + len(datas)), self._now()
+            self._append_many([
+                {"op": "put", "id": item_id, "data": data, "v": version, "t": now}
+                for item_id, data, version in zip(item_ids, datas, versions)
+            ])
+            for item_id, data, version in zip(item_ids, datas, versions):
+                self._apply_put(item_id, data, version, now)
+        return item_ids
+
+    # Replaces the existing items among `entries`; returns their ids
+    def put_many(self, entries: list[tuple[int, dict]]) -> list[int]:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            entries = [(item_id, data) for item_id, data in entries if item_id in self._index]
+            versions, now = range(self._seq + 1, self._seq + 1 + len(entries)), self._now()
+            self._append_many([
+                {"op": "put", "id": item_id, "data": data, "v": version, "t": now}
+                for (item_id, data), version in zip(entries, versions)
+            ])
+            for (item_id, data), version in zip(entries, versions):
+                self._apply_put(item_id, data, version, now)
+        return [item_id for item_id, _ in entries]
+
+    def delete(self, item_id: int) -> bool:
+        with self._lock, self._file_lock():
+            self._catch_up()
+            if item_id not in self._index:
+                return False
+            version, now = self._seq + 1, self._now()
+            self._append({"op": "del", "id": item_id, "v": version, "t": now})
+            self._apply_delete(item_id, version, now)
+        return True
+
+    # Maintenance
+
+    def refresh(self):
+        # Pick up records appended by other workers since the last replay
+        with self._lock, self._file_lock():
+            self._catch_up()
+
+    def needs_compaction(self) -> bool:
+        dead = self._records - len(self._index)
+        return (
+            self._records >= self.compact_min_records
+            and dead >= self._records * self.compact_dead_ratio
+        )
+
+    def compact(self):
+        with self._lock, self._file_lock():
+            self._catch_up()
+            tmp_path = self.path + ".compact"
+            with open(tmp_path, "wb") as tmp:
+                # Dropped deletes may have held the highest version / item_id
+                tmp.write(self._encode({"op": "meta", "seq": self._seq, "next_id": self._next_id, "t": self._modified}))
+                for item_id, record in self._index.items():
+                    tmp.write(self._encode({
+                        "op": "put", "id": item_id, "data": record.to_dict(),
+                        "v": record.version, "t": record.modified, "c": record.created,
+                    }))
+                tmp.flush()
+                os.fsync(tmp.fileno())
+                size = tmp.tell()
+            self._log.close()
+            os.replace(tmp_path, self.path)
+            self._reopen()
+            self._records = len(self._index) + 1
+            self._offset = size
+
+    def maintain(self):
+        self.refresh()
+        if self.needs_compaction():
+            self.compact()
+
+    # Internals
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _now() -> float:
+        return round(time.time(), 3)
+
+    @staticmethod
+    def _encode(record: dict) -> bytes:
+        return (json.dumps(record, separators=(",", ":")) + "\n").encode()
+
+    def _append(self, record: dict):
+        self._append_many([record])
+
+    def _append_many(self, records: list[dict]):
+        chunk = b"".join(self._encode(record) for record in records)
+        self._log.write(chunk)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._records += len(records)
+        self._offset += len(chunk)
+
+    def _reopen(self):
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.path, "ab")
+        self._inode = os.fstat(self._log.fileno()).st_ino
+
+    def _catch_up(self):
+        # Another worker may have compacted the log (new file) or appended to it
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode:
+            self._swap_in_compacted()
+        elif stat.st_size != self._offset:
+            self._replay()
+
+    def _swap_in_compacted(self):
+        # Replay the new file into a separate store and swap its index in, so
+        # lock-free readers never see the items half replayed; then tell the
+        # listeners what changed since our last catch-up
+        fresh = ItemStore(self.path)
+        fresh._replay()
+        self._reopen()
+        old = self._index
+        self._index, self._ids = fresh._index, fresh._ids
+        self._next_id = max(self._next_id, fresh._next_id)
+        self._seq = max(self._seq, fresh._seq)
+        self._touch(fresh._modified)
+        self._records, self._offset = fresh._records, fresh._offset
+        for item_id in old.keys() - self._index.keys():
+            for listener in self._listeners:
+                listener(item_id, None)
+        for item_id, record in self._index.items():
+            previous = old.get(item_id)
+            if previous is None or previous.version != record.version:
+                for listener in self._listeners:
+                    listener(item_id, record)
+
+    def _replay(self):
+        # Called with the file lock held, so no record is being written: a
+        # last line without a newline is what a worker that died mid-append
+        # left behind. It is cut off, or the next append would be glued to it.
+        ## A complete line that doesn't parse (such a fragment with a record
+        ## glued on, from before this was done) is skipped, not replayed.
+        with open(self.path, "rb") as log:
+            log.seek(self._offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping corrupt record at offset %d of %s", self._offset, self.path)
+                    self._records += 1
+                    self._offset += len(line)
+                    continue
+                op = record["op"]
+                version = record.get("v") or self._seq + 1  # logs from before versioning
+                written = record.get("t")
+                if op == "put":
+                    self._apply_put(record["id"], record["data"], version, written, record.get("c"))
+                elif op == "patch":
+                    current = self._index.get(record["id"])
+                    if current is not None:
+                        self._apply_put(record["id"], {**current, **record["data"]}, version, written)
+                elif op == "del":
+                    self._apply_delete(record["id"], version, written)
+                elif op == "meta":
+                    self._seq = max(self._seq, record["seq"])
+                    self._next_id = max(self._next_id, record["next_id"])
+                    self._touch(written)
+                self._records += 1
+                self._offset += len(line)
+        if os.path.getsize(self.path) > self._offset:
+            logger.warning("Truncating a partial record at the end of %s", self.path)
+            os.truncate(self.path, self._offset)
+
+    def _touch(self, written: float | None):
+        if written is not None and (self._modified is None or written > self._modified):
+            self._modified = written
+
+    def _apply_put(self, item_id: int, data: dict, version: int, written: float | None, created: float | None = None):
+        old = self._index.get(item_id)
+        if old is None:
+            if not self._ids or item_id > self._ids[-1]:
+                self._ids.append(item_id)
+            else:
+                insort(self._ids, item_id)
+            created = created or written
+        else:
+            created = old.created
+        record = self._index[item_id] = make_record(data, version, created, written)
+        self._seq = max(self._seq, version)
+        self._touch(written)
+        if item_id >= self._next_id:
+            self._next_id = item_id + 1
+        for listener in self._listeners:
+            listener(item_id, record)
+
+    def _apply_delete(self, item_id: int, version: int | None = None, written: float | None = None):
+        if version is not None:
+            self._seq = max(self._seq, version)
+            self._touch(written)
+        if self._index.pop(item_id, None) is not None:
+            del self._ids[bisect_right(self._ids, item_id) - 1]
+            for listener in self._listeners:
+                listener(item_id, None)
@@ -0,0 +1,250 @@
+from typing import Any, Awaitable, Callable
+import asyncio
+import json
+import logging
+import random
+import time
+
+from database import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+JOBS_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        run_at REAL NOT NULL,
+        lease_until REAL,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at)",
+)
+
+# Oldest ready job, or a running one whose worker died (lease ran out)
+_CLAIM = """
+    UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ?
+    WHERE job_id = (
+        SELECT job_id FROM jobs
+        WHERE (status = 'queued' AND run_at <= ?) OR (status = 'running' AND lease_until < ?)
+        ORDER BY run_at, job_id LIMIT 1
+    )
+    RETURNING job_id, kind, payload, attempts, max_attempts
+"""
+
+_COLUMNS = "job_id, kind, status, attempts, max_attempts, run_at, result, error, created_at, updated_at"
+
+
+# Durable background jobs on SQLite
+## enqueue() stores a job and returns its id straight away; `concurrency`
+## worker tasks claim ready jobs one at a time (a single UPDATE ... RETURNING,
+## so several processes can share one jobs file) and run the handler
+## registered for the job's kind. A failed attempt is retried after an
+## exponential backoff with jitter until max_attempts, then marked failed.
+## Jobs survive restarts: queued ones are picked up again, and a running job
+## whose worker died is reclaimed once its lease expires (handlers are
+## cancelled at the lease, so a live worker never loses its job).
+## At most `max_pending` jobs may be queued or running; past that enqueue()
+## raises QueueFull so the route can shed load (503).
+
+class JobQueue:
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        concurrency: int = 2,
+        max_pending: int = 1000,
+        max_attempts: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        lease: float = 300.0,
+        poll_interval: float = 1.0,
+        retention: float = 7 * 86400,
+    ):
+        self.pool = pool
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retention = retention
+
+        self._handlers: dict[str, Callable[[dict], Awaitable[Any]]] = {}
+        self._workers: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+        self.running = 0
+        self.enqueued = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def register(self, kind: str, handler: Callable[[dict], Awaitable[Any]]):
+        self._handlers[kind] = handler
+
+    # Lifecycle
+
+    async def start(self):
+        async with self.pool.connection() as conn:
+            for statement in JOBS_SCHEMA:
+                await conn.execute(statement)
+            await conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                (time.time() - self.retention,),
+            )
+            await conn.commit()
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = 10.0):
+        # Let running jobs finish for up to `timeout`; the rest are cancelled
+        # and put back in the queue without counting the attempt
+        self._stopping = True
+        self._wakeup.set()
+        if not self._workers:
+            return
+        _, pending = await asyncio.wait(self._workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # Producer side
+
+    async def enqueue(self, kind: str, payload: dict, max_attempts: int | None = None, delay: float = 0.0) -> int:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        now = time.time()
+        async with self.pool.connection() as conn:
+            async with conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')") as cursor:
+                (pending,) = await cursor.fetchone()
+            if pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"{pending} jobs already pending")
+            cursor = await conn.execute(
+                "INSERT INTO jobs (kind, payload, status, max_attempts, run_at, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (kind, json.dumps(payload), max_attempts or self.max_attempts, now + delay, now, now),
+            )
+            await conn.commit()
+        self.enqueued += 1
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    async def get(self, job_id: int) -> dict | None:
+        async with self.pool.connection() as conn:
+            async with conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)) as cursor:
+                row = await cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "running": self.running,
+            "enqueued": self.enqueued,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    # Worker side
+
+    async def _claim(self) -> tuple | None:
+        now = time.time()
+        async with self.pool.connection() as conn:
+            async with conn.execute(_CLAIM, (now + self.lease, now, now, now)) as cursor:
+                row = await cursor.fetchone()
+            await conn.commit()
+        return tuple(row) if row is not None else None
+
+    async def _finish(self, job_id: int, status: str, result: Any = None, error: str | None = None, run_at: float | None = None):
+        now = time.time()
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, run_at = COALESCE(?, run_at), "
+                "lease_until = NULL, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(result) if result is not None else None, error, run_at, now, job_id),
+            )
+            await conn.commit()
+
+    async def _requeue_interrupted(self, job_id: int):
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_until = NULL, updated_at = ? "
+                "WHERE job_id = ?",
+                (time.time(), job_id),
+            )
+            await conn.commit()
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _work(self):
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+            if job is None:
+                # Nothing ready: sleep until enqueue() wakes us, or poll for
+                # retries coming due and jobs enqueued by other processes
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(*job)
+            except Exception:
+                logger.exception("Recording the outcome of job %s failed", job[0])
+
+    async def _run(self, job_id: int, kind: str, payload: str, attempts: int, max_attempts: int):
+        handler = self._handlers.get(kind)
+        self.running += 1
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind: {kind}")
+            result = await asyncio.wait_for(handler(json.loads(payload)), self.lease)
+        except asyncio.CancelledError:
+            await asyncio.shield(self._requeue_interrupted(job_id))
+            raise
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if attempts < max_attempts:
+                delay = self._retry_delay(attempts)
+                logger.warning("Job %s (%s) attempt %s failed, retrying in %.1fs: %s", job_id, kind, attempts, delay, error)
+                self.retried += 1
+                await self._finish(job_id, "queued", error=error, run_at=time.time() + delay)
+            else:
+                logger.error("Job %s (%s) failed after %s attempts: %s", job_id, kind, attempts, error)
+                self.failed += 1
+                await self._finish(job_id, "failed", error=error)
+        else:
+            self.succeeded += 1
+            await self._finish(job_id, "succeeded", result=result)
+        finally:
+            self.running -= 1
@@ -0,0 +1,230 @@
+# Pre-fork launcher for main:app
+## The parent imports the app once (preload), binds the listening socket and
+## forks N Uvicorn workers that share it, so imported code and module state
+## are shared copy-on-write and every worker starts from the same secrets.
+## With --reuse-port each worker binds its own SO_REUSEPORT socket instead and
+## the kernel balances connections between them.
+##
+## - Workers exit after --max-requests (+ random jitter) and are replaced, to
+##   bound memory growth; crashed workers are replaced too.
+## - SIGTERM / SIGINT: workers stop accepting, finish in-flight requests for up
+##   to --graceful-timeout seconds, then are killed.
+## - SIGHUP: replace all workers (picks up nothing new from disk, since the app
+##   is preloaded, but resets their memory).
+## - Unless PASSWORD_HASH_WORKERS is set, the workers share half the CPUs
+##   for password hashing processes, instead of each starting that many.
+## - Without fork() (Windows) a single Uvicorn process is run instead.
+##
+## python launcher.py --host 0.0.0.0 --port 8000 --workers 4
+
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+logger = logging.getLogger("launcher")
+
+# A worker that dies sooner than this after starting is considered crashing;
+# it is replaced after a short back-off instead of immediately
+MIN_WORKER_LIFETIME = 1.0
+RESPAWN_BACKOFF = 1.0
+
+
+def bind_socket(host: str, port: int, reuse_port: bool = False, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def worker_config(app, args) -> uvicorn.Config:
+    max_requests = None
+    if args.max_requests:
+        # Jitter so workers started together don't all recycle together
+        max_requests = args.max_requests + random.randint(0, args.max_requests_jitter)
+    return uvicorn.Config(
+        app,
+        lifespan="on",
+        log_config=None,  # the app's own logging setup (JSON lines via a queue)
+        access_log=args.access_log,
+        limit_max_requests=max_requests,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+    )
+
+
+class Arbiter:
+    def __init__(self, app, args):
+        self.app = app
+        self.args = args
+        self.workers: dict[int, float] = {}  # pid -> start time
+        self.retiring: set[int] = set()  # pids we asked to stop, not to be replaced
+        self.sock: socket.socket | None = None
+        self.stopping = False
+        self.reload = False
+
+    def run(self):
+        if not self.args.reuse_port:
+            self.sock = bind_socket(self.args.host, self.args.port, backlog=self.args.backlog)
+        logger.info(
+            "Listening on %s:%s with %s workers (pid %s)", self.args.host, self.args.port, self.args.workers, os.getpid()
+        )
+
+        # Everything imported so far stays shared: keep the collector from
+        # touching (and so copying) those objects in the children
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        for _ in range(self.args.workers):
+            self.spawn()
+        while not self.stopping:
+            if self.reload:
+                self.reload = False
+                self.replace_all()
+            self.reap()
+            time.sleep(0.2)
+        self.shutdown()
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reload = True
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+        self.run_worker()
+
+    def run_worker(self):
+        # Uvicorn handles SIGTERM / SIGINT while serving and re-raises them once
+        # drained; ignored here, so the worker then exits normally, running
+        # atexit (which flushes the log queue)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        try:
+            sock = self.sock or bind_socket(self.args.host, self.args.port, reuse_port=True, backlog=self.args.backlog)
+            uvicorn.Server(worker_config(self.app, self.args)).run(sockets=[sock])
+        except Exception:
+            logger.exception("Worker %s failed", os.getpid())
+            sys.exit(1)
+        sys.exit(0)
+
+    def reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if pid in self.retiring or self.stopping:
+                self.retiring.discard(pid)
+                continue
+            if code == 0:
+                logger.info("Worker %s exited (recycled), replacing it", pid)
+            else:
+                logger.warning("Worker %s exited with %s, replacing it", pid, code)
+                if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                    time.sleep(RESPAWN_BACKOFF)
+            self.spawn()
+
+    def replace_all(self):
+        # One at a time, so capacity never drops by more than a worker
+        for pid in list(self.workers):
+            self.spawn()
+            self.terminate([pid])
+
+    def terminate(self, pids: list[int]):
+        self.retiring.update(pids)
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.args.graceful_timeout + 1
+        while any(pid in self.workers for pid in pids) and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in pids:
+            if pid in self.workers:
+                logger.warning("Worker %s did not drain in %ss, killing it", pid, self.args.graceful_timeout)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        while any(pid in self.workers for pid in pids):
+            self.reap()
+            time.sleep(0.05)
+
+    def shutdown(self):
+        logger.info("Shutting down %s workers", len(self.workers))
+        self.terminate(list(self.workers))
+        if self.sock is not None:
+            self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run main:app on several worker processes")
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+    )
+    parser.add_argument("--reuse-port", action="store_true", help="one SO_REUSEPORT socket per worker")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.environ.get("GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--max-requests", type=int, default=int(os.environ.get("MAX_REQUESTS", "0")))
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.environ.get("MAX_REQUESTS_JITTER", "0")))
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    # Each worker starts its own password hashing process pool: split the
+    # default (half the CPUs) between them rather than giving each that many
+    if hasattr(os, "fork") and not os.environ.get("PASSWORD_HASH_WORKERS"):
+        os.environ["PASSWORD_HASH_WORKERS"] = str(max(1, (os.cpu_count() or 2) // 2 // args.workers))
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from main import app  # preload, also sets up logging
+
+    if not hasattr(os, "fork"):
+        logger.info("fork() is not available, running a single worker")
+        uvicorn.run(
+            app, host=args.host, port=args.port, log_config=None, access_log=args.access_log,
+            timeout_graceful_shutdown=args.graceful_timeout, limit_max_requests=args.max_requests or None,
+        )
+        return
+    if args.reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+        parser.error("SO_REUSEPORT is not supported on this platform")
+
+    Arbiter(app, args).run()
+
+
+if __name__ == "__main__":
+    main()
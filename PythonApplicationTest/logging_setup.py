@@ -0,0 +1,121 @@
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import uuid
+
+# Correlation ID of the request being handled in the current task
+correlation_id: ContextVar[str | None] = ContextVar("correlation_id", default=None)
+
+
+# One JSON object per line
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", None),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Non-blocking handler for the event loop side
+## Unlike QueueHandler.prepare(), nothing is formatted here: the record keeps
+## its msg/args and the listener thread does the formatting and the I/O.
+## (Callers should log with %-style args, not f-strings, to benefit.)
+## When the queue is full the record is dropped, or with policy="block" we
+## wait up to block_timeout seconds first.
+
+class BoundedQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop", block_timeout: float = 0.1):
+        super().__init__(log_queue)
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown log queue policy: {policy}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.correlation_id = correlation_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# Replace the root handlers with queue -> background thread -> stream
+def setup_logging(
+    level: int | str = logging.INFO,
+    queue_size: int = 10000,
+    policy: str = "drop",
+    stream=None,
+) -> BoundedQueueHandler:
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = BoundedQueueHandler(log_queue, policy=policy)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JSONFormatter())
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # flushes whatever is still queued
+    if hasattr(os, "register_at_fork"):
+        # Threads don't survive fork(): drain and stop the listener first (so no
+        # lock is held mid-write), then restart it in both parent and child
+        os.register_at_fork(before=listener.stop, after_in_parent=listener.start, after_in_child=listener.start)
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
+
+
+# ASGI middleware assigning each request a correlation ID
+## Reuses the caller's X-Request-ID when present and echoes it back.
+
+class CorrelationIdMiddleware:
+    def __init__(self, app: ASGIApp, header_name: str = "X-Request-ID"):
+        self.app = app
+        self.header_name = header_name
+        self._raw_header = header_name.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == self._raw_header:
+                request_id = value.decode("latin-1")[:128]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[self.header_name] = request_id
+            await send(message)
+
+        token = correlation_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            correlation_id.reset(token)
@@ -1,13 +1,325 @@
-from fastapi import FastAPI, Query, Path, Body, Cookie, Header, Form, UploadFile, File, HTTPException
-from typing import Annotated, Literal
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, Query, Path, Body, Cookie, Header, Form, UploadFile, File, HTTPException, Depends, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, Literal
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter
+import asyncio
 import logging
+import os
+import secrets
+
+from analytics import ItemColumns
+from batch import batch_openapi, validate_batch
+from cache import TTLCache, request_cache_key
+from coalesce import SingleFlight
+from compression import CompressionMiddleware
+from database import ConnectionPool, PoolTimeout, UserRepository, init_schema, sqlite_connect
+from export import export_csv, export_ndjson
+from hashing import HasherBusy, PasswordHasher, hash_password
+from indexes import FilterParams, ItemIndexes
+from etags import CachePolicy, if_match, make_etag
+from item_store import MAX_ITEM_ID, ItemStore, VersionConflict
+from jobs import JobQueue, QueueFull
+from logging_setup import CorrelationIdMiddleware, setup_logging
+from metrics import Metrics, MetricsMiddleware
+from pagination import CursorParams, decode_cursor
+from patching import FieldPatcher, apply_patch, patch_openapi, read_patch
+from rate_limit import RateLimitMiddleware, RateLimitRule, SlidingWindowLogBackend, TokenBucketBackend, parse_rate
+from responses import FastJSONResponse, json_dumps
+from search import SearchIndex
+from tokens import InvalidToken, TokenVerifier
+from uploads import process_upload, stream_upload
+from validators import FastRejectRoute
 
 # Logging setup
-logging.basicConfig(level=logging.INFO)
+## Records are queued and written as JSON lines by a background thread, so
+## handlers never do log I/O on the event loop.
+log_handler = setup_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    queue_size=int(os.environ.get("LOG_QUEUE_SIZE", "10000")),
+    policy=os.environ.get("LOG_QUEUE_POLICY", "drop"),
+)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Item store setup
+ITEM_STORE_PATH = os.environ.get("ITEM_STORE_PATH", "data/items.log")
+ITEM_STORE_MAINTENANCE_INTERVAL = float(os.environ.get("ITEM_STORE_MAINTENANCE_INTERVAL", "30"))
+
+store = ItemStore(ITEM_STORE_PATH, fsync=os.environ.get("ITEM_STORE_FSYNC") == "1")
+
+# Read cache for GET /items/{item_id}: (version, rendered body), tagged by item_id and
+# dropped on every write to that item (including writes replayed from other workers)
+item_cache = TTLCache(
+    maxsize=int(os.environ.get("ITEM_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("ITEM_CACHE_TTL", "60")),
+)
+store.subscribe(lambda item_id, data: item_cache.invalidate(item_id))
+
+# Secondary indexes (price, created/updated time, tags) for GET /items/filter
+item_indexes = ItemIndexes(store)
+
+# Full-text search over name and description (GET /items/search). The index is
+# snapshotted next to the log, at shutdown and once SEARCH_SNAPSHOT_MIN_WRITES
+# writes have accumulated, so a restart only replays the writes made since.
+search_index = SearchIndex(store, path=os.environ.get("SEARCH_INDEX_PATH", ITEM_STORE_PATH + ".search"))
+SEARCH_SNAPSHOT_MIN_WRITES = int(os.environ.get("SEARCH_SNAPSHOT_MIN_WRITES", "10000"))
+
+# Columnar (NumPy) mirror of price, tax and tags for GET /items/stats
+item_columns = ItemColumns(store)
+
+# Conditional GET: ETags come from the store's write versions, so a poll of an
+# unchanged item or listing is answered with 304 before anything is serialized
+ITEM_CACHE_POLICY = CachePolicy(os.environ.get("ITEM_CACHE_CONTROL", "no-cache"))
+ITEM_LIST_CACHE_POLICY = CachePolicy(os.environ.get("ITEM_LIST_CACHE_CONTROL", "no-cache"))
+
+# Batch setup
+ITEM_BATCH_MAX_SIZE = int(os.environ.get("ITEM_BATCH_MAX_SIZE", "50000"))
+
+# Database setup: one bounded pool shared by all requests
+db_pool = ConnectionPool(
+    sqlite_connect(os.environ.get("DATABASE_PATH", "data/app.db")),
+    size=int(os.environ.get("DB_POOL_SIZE", "5")),
+    timeout=float(os.environ.get("DB_POOL_TIMEOUT", "5")),
+)
+
+# Password hashing on a process pool, shedding load past PASSWORD_HASH_MAX_PENDING
+password_hasher = PasswordHasher(
+    workers=int(os.environ.get("PASSWORD_HASH_WORKERS", "0")) or None,
+    max_pending=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "0")) or None,
+)
+
+DUMMY_PASSWORD_HASH = hash_password(os.urandom(16).hex())
+
+# Signed access tokens; set TOKEN_SECRET so all workers accept each other's tokens
+TOKEN_TTL = float(os.environ.get("TOKEN_TTL", "3600"))
+token_verifier = TokenVerifier(
+    os.environ.get("TOKEN_SECRET", "").encode() or secrets.token_bytes(32),
+    cache_size=int(os.environ.get("TOKEN_CACHE_SIZE", "10000")),
+)
+
+# Upload setup
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR", "data/uploads")
+UPLOAD_STORE_DIR = os.environ.get("UPLOAD_STORE_DIR", "data/files")
+
+# Background jobs, persisted in their own SQLite file so they survive restarts
+job_pool = ConnectionPool(sqlite_connect(os.environ.get("JOB_QUEUE_PATH", "data/jobs.db")), size=2)
+job_queue = JobQueue(
+    job_pool,
+    concurrency=int(os.environ.get("JOB_WORKERS", "2")),
+    max_pending=int(os.environ.get("JOB_QUEUE_MAX_PENDING", "1000")),
+    max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", "5")),
+)
+job_queue.register("upload.postprocess", lambda payload: process_upload(payload, UPLOAD_STORE_DIR))
+
+# Coalescing of identical concurrent reads: clients polling the same job share
+# one query; a caller still waiting after COALESCE_MAX_WAIT queries on its own
+job_reads = SingleFlight(max_wait=float(os.environ.get("COALESCE_MAX_WAIT", "2")))
+
+
+@job_reads.coalesce(key=lambda job_id: job_id)
+async def load_job(job_id: int) -> dict | None:
+    return await job_queue.get(job_id)
+
+
+# Periodically pick up other workers' writes and compact the log
+async def maintain_store():
+    while True:
+        await asyncio.sleep(ITEM_STORE_MAINTENANCE_INTERVAL)
+        try:
+            await run_in_threadpool(store.maintain)
+        except Exception:
+            logger.exception("Item store maintenance failed")
+        if search_index.dirty(SEARCH_SNAPSHOT_MIN_WRITES):
+            try:
+                await run_in_threadpool(search_index.save)
+            except Exception:
+                logger.exception("Saving the search index failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    search_index.load()
+    store.open()  # replays the log
+    search_index.verify()
+    await init_schema(db_pool)
+    password_hasher.start()
+    await job_queue.start()
+    maintenance = asyncio.create_task(maintain_store())
+    yield
+    maintenance.cancel()
+    await job_queue.stop(timeout=float(os.environ.get("JOB_DRAIN_TIMEOUT", "10")))
+    password_hasher.shutdown()
+    await job_pool.close()
+    await db_pool.close()
+    if search_index.dirty():
+        search_index.save()
+    store.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# Reject invalid path/query parameters with checks compiled from each route's
+# Path()/Query() constraints, before dependencies run or the body is read
+if os.environ.get("FAST_REJECT_ENABLED", "1") == "1":
+    app.router.route_class = FastRejectRoute
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get("COMPRESSION_MINIMUM_SIZE", "500")),
+)
+
+# Rate limiting per client IP on the write and upload routes
+## RATE_LIMIT_ALGORITHM: token_bucket (bursty, default) or sliding_window (exact)
+if os.environ.get("RATE_LIMIT_ALGORITHM") == "sliding_window":
+    rate_limit_backend = SlidingWindowLogBackend()
+else:
+    rate_limit_backend = TokenBucketBackend()
+rate_limit_rules = [
+    RateLimitRule(
+        *parse_rate(os.environ.get("RATE_LIMIT_ITEM_WRITES", "600/60")),
+        key="ip", methods=("POST", "PUT", "PATCH"), path_prefixes=("/items/",),
+    ),
+    RateLimitRule(
+        *parse_rate(os.environ.get("RATE_LIMIT_UPLOADS", "30/60")),
+        key="ip", methods=("POST",), path_prefixes=("/uploadfile/",),
+    ),
+]
+if os.environ.get("RATE_LIMIT_ENABLED", "1") == "1":
+    app.add_middleware(RateLimitMiddleware, backend=rate_limit_backend, rules=rate_limit_rules)
+
+# Metrics (outermost, so latency includes compression and sizes are as sent)
+metrics = Metrics()
+
+
+def item_cache_metrics() -> dict[str, float]:
+    stats = item_cache.stats()
+    return {
+        "item_cache_entries": stats["size"],
+        **{f"item_cache_{name}_total": stats[name] for name in ("hits", "misses", "evictions", "expirations", "invalidations")},
+    }
+
+
+metrics.add_collector(item_cache_metrics)
+metrics.add_collector(lambda: {"log_records_dropped_total": log_handler.dropped})
+
+
+def db_pool_metrics() -> dict[str, float]:
+    stats = db_pool.stats()
+    return {
+        "db_pool_size": stats["size"],
+        "db_pool_open_connections": stats["opened"],
+        "db_pool_in_use": stats["in_use"],
+        "db_pool_waiting": stats["waiting"],
+        "db_pool_acquisitions_total": stats["acquisitions"],
+        "db_pool_waits_total": stats["waits"],
+        "db_pool_timeouts_total": stats["timeouts"],
+        "db_pool_wait_seconds_total": stats["wait_seconds"],
+    }
+
+
+metrics.add_collector(db_pool_metrics)
+metrics.add_collector(lambda: {
+    "rate_limit_tracked_keys": len(rate_limit_backend.keys.entries),
+    "rate_limit_key_evictions_total": rate_limit_backend.keys.evictions,
+})
+metrics.add_collector(lambda: {
+    "token_cache_entries": token_verifier.stats()["size"],
+    "token_cache_hits_total": token_verifier.hits,
+    "token_cache_misses_total": token_verifier.misses,
+    "token_cache_evictions_total": token_verifier.evictions,
+})
+metrics.add_collector(lambda: {
+    "password_hash_pending": password_hasher.pending,
+    "password_hash_rejected_total": password_hasher.rejected,
+    "password_hash_pool_restarts_total": password_hasher.restarts,
+})
+
+
+def job_queue_metrics() -> dict[str, float]:
+    stats = job_queue.stats()
+    return {
+        "jobs_running": stats["running"],
+        **{f"jobs_{name}_total": stats[name] for name in ("enqueued", "succeeded", "retried", "failed", "rejected")},
+    }
+
+
+metrics.add_collector(job_queue_metrics)
+metrics.add_collector(lambda: {
+    "item_index_walks_total": item_indexes.walks,
+    "item_index_lookups_total": item_indexes.lookups,
+    "item_index_rebuilds_total": item_indexes.stats()["rebuilds"],
+})
+metrics.add_collector(lambda: {"item_columns_rebuilds_total": item_columns.rebuilds})
+metrics.add_collector(lambda: {
+    "search_index_documents": len(search_index),
+    "search_queries_total": search_index.queries,
+})
+metrics.add_collector(lambda: {
+    "job_reads_in_flight": job_reads.stats()["in_flight"],
+    "job_reads_calls_total": job_reads.calls,
+    "job_reads_collapsed_total": job_reads.collapsed,
+    "job_reads_wait_timeouts_total": job_reads.timeouts,
+})
+metrics.add_collector(lambda: {
+    "store_refreshes_total": store_refreshes.calls,
+    "store_refreshes_collapsed_total": store_refreshes.collapsed,
+})
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Correlation IDs (X-Request-ID) for every log record emitted while handling a request
+app.add_middleware(CorrelationIdMiddleware)
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# Item store access from handlers
+## Writes run in worker threads: they wait for the store's locks, which a
+## compaction (by this worker or another one) holds for the whole rewrite,
+## while the event loop keeps serving reads.
+## Reads first catch up with writes made by other workers since the last
+## refresh: one stat() per request, and a replay (in a worker thread) only if
+## the log changed, so a POST on one worker is visible to a GET on another.
+## Concurrent reads share one refresh instead of each queueing its own. One
+## already running may have started before the write this request must see,
+## so a read still stale after it joins the next one, which started later.
+store_refreshes = SingleFlight()
+
+
+async def caught_up_store():
+    for _ in range(2):
+        if not store.stale():
+            return
+        await store_refreshes.do("refresh", lambda: run_in_threadpool(store.refresh))
+
+
+# Conditional GET for the collection routes (listing, filter, search, stats,
+# export): the ETag is the store's latest write version, which changes with
+# any write. Answers 304 when the client's copy is current; otherwise returns
+# the validator headers for the response.
+async def item_list_headers(request: Request, _: Annotated[None, Depends(caught_up_store)]) -> dict[str, str]:
+    etag = make_etag(store.seq)
+    headers = ITEM_LIST_CACHE_POLICY.headers(etag, store.modified)
+    if ITEM_LIST_CACHE_POLICY.not_modified(request, etag, store.modified):
+        raise HTTPException(status_code=304, headers=headers)
+    return headers
+
+
+# Dependencies with yield: a pooled database connection per request
+## A saturated pool answers 503 instead of queueing requests indefinitely.
+async def get_db():
+    try:
+        conn = await db_pool.acquire()
+    except PoolTimeout:
+        raise HTTPException(status_code=503, detail="Database busy", headers={"Retry-After": "1"})
+    try:
+        yield conn
+    finally:
+        db_pool.release(conn)
 
 
 # Pydantic model with validations
@@ -16,41 +328,318 @@ class Item(BaseModel):
     description: str | None = Field(default=None, max_length=300)
     price: float = Field(..., gt=0)
     tax: float | None = Field(default=None, ge=0)
+    tags: list[Annotated[str, Field(min_length=1, max_length=50)]] = Field(default=[], max_length=20)
 
 
 # Create item from request body
 @app.post("/items/")
-async def create_item(item: Item):
-    item_dict = item.dict()
+async def create_item(item: Item, response: Response):
+    item_id, stored = await run_in_threadpool(store.create, item.dict())
+    response.headers["ETag"] = make_etag(store.version(item_id))
+    item_dict = {"item_id": item_id, **stored}
     if item.tax is not None:
         item_dict["price_with_tax"] = item.price + item.tax
     return item_dict
 
 
+# Batch create / update
+## Body is a JSON array or NDJSON (Content-Type: application/x-ndjson).
+## Valid elements are stored with a single log write; invalid ones are
+## reported by index next to the successful results.
+## Declared before /items/{item_id} so "batch" isn't matched as an item_id.
+
+class ItemWithId(Item):
+    item_id: int = Field(..., ge=1, le=MAX_ITEM_ID)
+
+
+item_batch_adapter = TypeAdapter(list[Item])
+item_with_id_batch_adapter = TypeAdapter(list[ItemWithId])
+
+
+def batch_results(entries: list[tuple[int, int, dict]], errors: dict[int, list[dict]], status: str) -> dict:
+    results = [{"index": index, "status": "error", "errors": errs} for index, errs in errors.items()]
+    for index, item_id, data in entries:
+        result = {"index": index, "status": status, "item_id": item_id, **data}
+        if data["tax"] is not None:
+            result["price_with_tax"] = data["price"] + data["tax"]
+        results.append(result)
+    results.sort(key=lambda result: result["index"])
+    return {"succeeded": len(entries), "failed": len(errors), "results": results}
+
+
+@app.post("/items/batch", openapi_extra=batch_openapi(item_batch_adapter))
+async def create_items_batch(request: Request):
+    valid, errors = await validate_batch(request, item_batch_adapter, ITEM_BATCH_MAX_SIZE)
+    datas = [item.dict() for _, item in valid]
+    item_ids = await run_in_threadpool(store.create_many, datas) if datas else []
+    entries = [(index, item_id, data) for (index, _), item_id, data in zip(valid, item_ids, datas)]
+    return FastJSONResponse(batch_results(entries, errors, "created"))
+
+
+@app.put("/items/batch", openapi_extra=batch_openapi(item_with_id_batch_adapter))
+async def update_items_batch(request: Request):
+    valid, errors = await validate_batch(request, item_with_id_batch_adapter, ITEM_BATCH_MAX_SIZE)
+    entries = [(index, item.item_id, item.dict(exclude={"item_id"})) for index, item in valid]
+    if entries:
+        stored = set(await run_in_threadpool(store.put_many, [(item_id, data) for _, item_id, data in entries]))
+        for index, item_id, _ in entries:
+            if item_id not in stored:
+                errors[index] = [{"loc": ["item_id"], "msg": "Item not found", "type": "not_found"}]
+        entries = [entry for entry in entries if entry[1] in stored]
+    return FastJSONResponse(batch_results(entries, errors, "updated"))
+
+
+# Export every item as a stream (NDJSON by default, or CSV)
+## To resume an interrupted export, pass the last item_id received as `after`,
+## or start from a listing page with its `cursor`.
+@app.get("/items/export")
+async def export_items(
+    headers: Annotated[dict[str, str], Depends(item_list_headers)],
+    format: Annotated[Literal["ndjson", "csv"], Query()] = "ndjson",
+    after: Annotated[int | None, Query(ge=0, description="Resume after this item_id")] = None,
+    cursor: Annotated[str | None, Query(description="Cursor from GET /items/")] = None,
+):
+    if cursor:
+        after = decode_cursor(cursor)
+    if format == "csv":
+        return StreamingResponse(export_csv(store, after), media_type="text/csv", headers=headers)
+    return StreamingResponse(export_ndjson(store, after), media_type="application/x-ndjson", headers=headers)
+
+
+# List items, keyset-paginated by item_id
+## Pass `next_cursor` back as `cursor` to get the following page; inserts made
+## in the meantime never shift or duplicate items across pages.
+@app.get("/items/")
+async def read_items(
+    headers: Annotated[dict[str, str], Depends(item_list_headers)],
+    page: Annotated[CursorParams, Depends()],
+):
+    item_ids, next_cursor = page.page(store.ids_after(page.after, page.limit + 1))
+    items = [{"item_id": item_id, **data.to_dict()} for item_id in item_ids if (data := store.get(item_id)) is not None]
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor}, headers=headers)
+
+
+# Filtered listing, answered from the secondary indexes
+## e.g. /items/filter?tags=red&tags=sale&min_price=5&max_price=20&order_by=price
+## Declared before /items/{item_id} so "filter" isn't matched as an item_id.
+@app.get("/items/filter")
+async def filter_items(
+    headers: Annotated[dict[str, str], Depends(item_list_headers)],
+    filters: Annotated[FilterParams, Query()],
+):
+    page = filters.model_copy(update={"limit": filters.limit + 1})
+    # Worker thread: the query holds the index lock, and after a burst of
+    # writes first re-sorts the columns it reads (about a second at 1M items)
+    item_ids = await run_in_threadpool(item_indexes.query, page)
+    next_offset = filters.offset + filters.limit if len(item_ids) > filters.limit else None
+    items = [
+        {"item_id": item_id, **data.to_dict()}
+        for item_id in item_ids[: filters.limit] if (data := store.get(item_id)) is not None
+    ]
+    return FastJSONResponse({"items": items, "next_offset": next_offset}, headers=headers)
+
+
+# Aggregate price report over the whole catalog, from the columnar mirror
+## Totals, mean, min/max and the requested percentiles of price and tax, the
+## sum of price_with_tax over taxed items and, with group_by=tag, the same per
+## tag for the `top` most used tags. Declared before /items/{item_id}.
+@app.get("/items/stats")
+async def item_stats(
+    headers: Annotated[dict[str, str], Depends(item_list_headers)],
+    group_by: Literal["tag"] | None = None,
+    percentiles: Annotated[list[Annotated[float, Field(ge=0, le=100)]], Query()] = [50, 90, 99],
+    top: Annotated[int, Query(gt=0, le=1000)] = 100,
+):
+    # Worker thread: the first report builds the mirror (seconds at 1M items)
+    report = await run_in_threadpool(item_columns.summary, percentiles)
+    if group_by == "tag":
+        report["tags"] = await run_in_threadpool(item_columns.by_tag, percentiles, top)
+    return FastJSONResponse(report, headers=headers)
+
+
+# Full-text search over name and description, best BM25 matches first
+## With prefix (the default) the last word also matches longer words, for
+## search-as-you-type. Declared before /items/{item_id} like /items/filter.
+@app.get("/items/search")
+async def search_items(
+    headers: Annotated[dict[str, str], Depends(item_list_headers)],
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(gt=0, le=100)] = 10,
+    prefix: bool = True,
+):
+    # Worker thread: scoring holds the index lock and walks every posting of
+    # the query terms (most of a second for a term in every item at 1M items)
+    hits = await run_in_threadpool(search_index.search, q, limit, prefix)
+    items = []
+    for item_id, score in hits:
+        data = store.get(item_id)
+        if data is not None:
+            items.append({"item_id": item_id, "score": round(score, 4), **data.to_dict()})
+    return FastJSONResponse({"items": items}, headers=headers)
+
+
 # Update item with path and query param
+## Replaces an existing item (404 otherwise): ids are only allocated by POST.
 @app.put("/items/{item_id}")
 async def update_item(
-    item_id: Annotated[int, Path(title="The ID of the item to update", ge=1)],
+    item_id: Annotated[int, Path(title="The ID of the item to update", ge=1, le=MAX_ITEM_ID)],
     item: Item,
+    response: Response,
     q: Annotated[str | None, Query(min_length=3, max_length=50, pattern="^fixedquery$", alias="item-query")] = None
 ):
-    result = {"item_id": item_id, **item.dict()}
+    stored = await run_in_threadpool(store.put, item_id, item.dict())
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    response.headers["ETag"] = make_etag(store.version(item_id))
+    result = {"item_id": item_id, **stored}
     if q:
         result["q"] = q
     return result
 
 
+# Partial update
+## Body: a JSON Merge Patch (application/merge-patch+json, or plain JSON) or a
+## JSON Patch (application/json-patch+json). Only the fields it changes are
+## validated and written. Send the ETag of a previous response as If-Match to
+## update only if the item hasn't changed since (412 otherwise). Like reads,
+## it first catches up with other workers, so the 404 and If-Match checks
+## see their writes.
+item_patcher = FieldPatcher(Item)
+
+
+@app.patch("/items/{item_id}", dependencies=[Depends(caught_up_store)], openapi_extra=patch_openapi(Item))
+async def patch_item(
+    item_id: Annotated[int, Path(title="The ID of the item to patch", ge=1, le=MAX_ITEM_ID)],
+    request: Request,
+    if_match_header: Annotated[str | None, Header(alias="If-Match")] = None,
+):
+    content_type, document = await read_patch(request)
+    for _ in range(3):
+        current = store.get(item_id)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        version = current.version
+        if if_match_header is not None and not if_match(if_match_header, version):
+            raise HTTPException(status_code=412, detail="Item has been modified", headers={"ETag": make_etag(version)})
+        changes = item_patcher.validate(apply_patch(content_type, document, current), current)
+        if not changes:
+            break
+        try:
+            updated = await run_in_threadpool(store.update, item_id, changes, expected_version=version)
+        except VersionConflict:
+            continue  # written by another worker meanwhile: re-apply to the new version
+        if updated is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        current, version = updated
+        break
+    else:
+        raise HTTPException(status_code=409, detail="Item is being modified concurrently, retry")
+    return FastJSONResponse({"item_id": item_id, **current}, headers={"ETag": make_etag(version)})
+
+
 # Read item using path and query param
-@app.get("/items/{item_id}")
+## Answers 304 when If-None-Match holds the current version's ETag (or
+## If-Modified-Since is not older than the last change).
+@app.get("/items/{item_id}", dependencies=[Depends(caught_up_store)])
 async def read_item(
-    item_id: Annotated[int, Path(title="The ID of the item to get", ge=1)],
+    item_id: Annotated[int, Path(title="The ID of the item to get", ge=1, le=MAX_ITEM_ID)],
+    request: Request,
+    cache_key: Annotated[str, Depends(request_cache_key)],
     q: Annotated[str | None, Query(min_length=3, max_length=50, pattern="^fixedquery$", alias="item-query")] = None
 ):
-    item = {"item_id": item_id}
-    if q:
-        item["q"] = q
-        #logger.info(f"Stored item: {item}")
-    return item
+    record = store.get(item_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    etag = make_etag(record.version)
+    headers = ITEM_CACHE_POLICY.headers(etag, record.modified)
+    if ITEM_CACHE_POLICY.not_modified(request, etag, record.modified):
+        return Response(status_code=304, headers=headers)
+
+    # Bodies are cached with the version they were rendered from: a write can
+    # land (and invalidate) between rendering and set(), so an entry for
+    # another version is a miss rather than a stale body under the new ETag
+    cached = item_cache.get(cache_key)
+    if cached is not None and cached[0] == record.version:
+        body = cached[1]
+    else:
+        item = {"item_id": item_id, **record.to_dict()}
+        if q:
+            item["q"] = q
+            #logger.info("Stored item: %s", item)
+        body = json_dumps(item)
+        item_cache.set(cache_key, (record.version, body), tag=item_id)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# Read cache counters
+@app.get("/cache/stats")
+async def read_cache_stats():
+    return item_cache.stats()
+
+
+# Search index counters and approximate memory use
+@app.get("/search/stats")
+async def read_search_stats():
+    stats = await run_in_threadpool(search_index.stats)
+    return {**stats, "memory": await run_in_threadpool(search_index.memory)}
+
+
+# Users, persisted through the database pool
+class UserBase(BaseModel):
+    username: str = Field(..., min_length=1, max_length=50)
+    email: EmailStr
+    full_name: str | None = None
+
+
+class UserIn(UserBase):
+    password: str
+
+
+class UserOut(UserBase):
+    pass
+
+
+class UserInDB(UserBase):
+    hashed_password: str
+
+
+async def hash_or_shed(coro):
+    try:
+        return await coro
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="Too many signups in progress", headers={"Retry-After": "1"})
+
+
+async def save_user(user_in: UserIn, db) -> UserInDB | None:
+    hashed_password = await hash_or_shed(password_hasher.hash(user_in.password))
+    user_in_db = UserInDB(**user_in.dict(exclude={"password"}), hashed_password=hashed_password)
+    if not await UserRepository(db).create(user_in_db.dict()):
+        return None
+    return user_in_db
+
+
+@app.post("/user/", response_model=UserOut)
+async def create_user(user_in: UserIn, db: Annotated[Any, Depends(get_db)]):
+    user_saved = await save_user(user_in, db)
+    if user_saved is None:
+        raise HTTPException(status_code=409, detail="Username already registered")
+    return user_saved
+
+
+# Check a user's password and issue an access token
+@app.post("/login/")
+async def login(
+    username: Annotated[str, Form()],
+    password: Annotated[str, Form()],
+    db: Annotated[Any, Depends(get_db)],
+):
+    user = await UserRepository(db).get(username)
+    # Verify against a dummy hash for unknown users so timing doesn't reveal them
+    hashed_password = user["hashed_password"] if user else DUMMY_PASSWORD_HASH
+    if not await hash_or_shed(password_hasher.verify(password, hashed_password)) or user is None:
+        raise HTTPException(status_code=401, detail="Incorrect username or password")
+    access_token = token_verifier.issue(username, ttl=TOKEN_TTL)
+    return {"username": username, "access_token": access_token, "token_type": "bearer"}
 
 
 # Literal query parameter example
@@ -71,10 +660,34 @@ async def submit_form(
 
 
 # File upload example
+## Streamed in fixed-size chunks, so memory stays flat however large the file is.
+## A spooled file is post-processed by a background job (verified and moved
+## into content-addressed storage); poll GET /jobs/{job_id} for the outcome.
 @app.post("/uploadfile/")
-async def upload_file(file: UploadFile):
-    content = await file.read()
-    return {"filename": file.filename, "size": len(content)}
+async def upload_file(file: UploadFile, spool: bool = False):
+    result = await stream_upload(file, spool_dir=UPLOAD_SPOOL_DIR if spool else None)
+    response = {"filename": result.filename, "size": result.size, "sha256": result.sha256}
+    if result.path is not None:
+        try:
+            response["job_id"] = await job_queue.enqueue("upload.postprocess", {
+                "path": result.path, "filename": result.filename, "size": result.size, "sha256": result.sha256,
+            })
+        except (QueueFull, PoolTimeout):
+            await run_in_threadpool(os.remove, result.path)
+            raise HTTPException(status_code=503, detail="Upload processing is busy", headers={"Retry-After": "5"})
+    return response
+
+
+# Background job status
+@app.get("/jobs/{job_id}")
+async def read_job(job_id: Annotated[int, Path(title="The ID of the job", ge=1)]):
+    try:
+        job = await load_job(job_id)
+    except PoolTimeout:
+        raise HTTPException(status_code=503, detail="Database busy", headers={"Retry-After": "1"})
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 # Cookie example
@@ -84,8 +697,18 @@ async def read_cookie(my_cookie: Annotated[str | None, Cookie()] = None):
 
 
 # Header example with HTTPException
-@app.get("/protected/")
-async def protected_route(token: Annotated[str | None, Header()] = None):
-    if token != "expected-token":
+## The token header carries an access token from /login/ ("Bearer " optional)
+async def verify_token(token: Annotated[str | None, Header()] = None) -> dict:
+    if not token:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if token.startswith("Bearer "):
+        token = token[len("Bearer "):]
+    try:
+        return token_verifier.verify(token)
+    except InvalidToken:
         raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+@app.get("/protected/")
+async def protected_route(claims: Annotated[dict, Depends(verify_token)]):
     return {"message": "Welcome!"}
\ No newline at end of file
@@ -0,0 +1,151 @@
+from bisect import bisect_left
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+# Fixed-bucket histogram
+## observe() is one bisect and three increments. Buckets are stored
+## non-cumulative and only summed up when rendered.
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+# Metrics registry
+## Everything is recorded from the event loop thread, so plain ints and dicts
+## are enough: no locks on the request path.
+## Collectors let other components (caches, pools, ...) publish their own
+## counters and gauges; a name ending in _total is exported as a counter.
+
+class Metrics:
+    def __init__(self, latency_buckets: tuple = LATENCY_BUCKETS, size_buckets: tuple = SIZE_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.size_buckets = size_buckets
+        self.in_flight = 0
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.request_size: dict[tuple[str, str], Histogram] = {}
+        self.response_size: dict[tuple[str, str], Histogram] = {}
+        self.responses: dict[tuple[str, str, int], int] = {}
+        self._collectors: list[Callable[[], dict[str, float]]] = []
+
+    def add_collector(self, collector: Callable[[], dict[str, float]]):
+        self._collectors.append(collector)
+
+    def record(self, method: str, route: str, status: int, seconds: float, request_bytes: int, response_bytes: int):
+        key = (method, route)
+        latency = self.latency.get(key)
+        if latency is None:
+            latency = self.latency[key] = Histogram(self.latency_buckets)
+            self.request_size[key] = Histogram(self.size_buckets)
+            self.response_size[key] = Histogram(self.size_buckets)
+        latency.observe(seconds)
+        self.request_size[key].observe(request_bytes)
+        self.response_size[key].observe(response_bytes)
+        status_key = (method, route, status)
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    # Prometheus text exposition format 0.0.4
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_responses_total Responses by route and status code.",
+            "# TYPE http_responses_total counter",
+        ]
+        for (method, route, status), count in sorted(self.responses.items()):
+            lines.append(f"http_responses_total{_labels(method=method, route=route, status=status)} {count}")
+
+        for name, help_text, histograms in (
+            ("http_request_duration_seconds", "Request latency by route.", self.latency),
+            ("http_request_size_bytes", "Request body size by route.", self.request_size),
+            ("http_response_size_bytes", "Response body size by route, as sent.", self.response_size),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), histogram in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+
+        for collector in self._collectors:
+            for name, value in collector().items():
+                lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# ASGI middleware recording every HTTP request into a Metrics registry
+## Requests are labelled by route template (/items/{item_id}), read from the
+## scope once routing has run, so raw paths never explode label cardinality.
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        request_bytes = 0
+        response_bytes = 0
+        status = 500
+
+        async def counting_receive() -> Message:
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Message):
+            nonlocal response_bytes, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            metrics.record(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                time.perf_counter() - start,
+                request_bytes,
+                response_bytes,
+            )
@@ -0,0 +1,66 @@
+from fastapi import HTTPException, Query
+from typing import Annotated, Any
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+
+# Set CURSOR_SECRET when running several workers so they accept each other's
+# cursors; otherwise every process signs with its own random key.
+CURSOR_SECRET = os.environ.get("CURSOR_SECRET", "").encode() or secrets.token_bytes(32)
+MAX_PAGE_SIZE = 1000
+
+
+# Cursor tokens
+## A cursor is the last-seen sort key, JSON-encoded and HMAC-signed so clients
+## can pass it back but not forge or tamper with it: <payload>.<signature>
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(CURSOR_SECRET, payload, hashlib.sha256).digest()[:16]
+
+
+def encode_cursor(key: Any) -> str:
+    payload = json.dumps(key, separators=(",", ":")).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(cursor: str) -> Any:
+    try:
+        payload_part, signature_part = cursor.split(".")
+        payload = _b64decode(payload_part)
+        signature = _b64decode(signature_part)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return json.loads(payload)
+
+
+# Keyset pagination dependency
+## Use with Depends(); fetch `limit + 1` keys after `params.after` and pass them
+## to page() to get this page's keys plus the cursor for the next one.
+
+class CursorParams:
+    def __init__(
+        self,
+        cursor: Annotated[str | None, Query(description="Opaque cursor from a previous page")] = None,
+        limit: Annotated[int, Query(gt=0, le=MAX_PAGE_SIZE)] = 100,
+    ):
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+
+    def page(self, keys: list) -> tuple[list, str | None]:
+        if len(keys) > self.limit:
+            keys = keys[: self.limit]
+            return keys, encode_cursor(keys[-1])
+        return keys, None
@@ -0,0 +1,267 @@
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import Annotated, Any
+import copy
+import json
+
+MERGE_PATCH_CONTENT_TYPE = "application/merge-patch+json"
+JSON_PATCH_CONTENT_TYPE = "application/json-patch+json"
+ACCEPT_PATCH = f"{MERGE_PATCH_CONTENT_TYPE}, {JSON_PATCH_CONTENT_TYPE}"
+
+# Marks a top-level field removed by a patch
+REMOVED = object()
+
+
+# Partial updates without model round-trips
+## A patch document is applied to the stored dict and yields only the changed
+## top-level fields ({field: new value or REMOVED}); only those fields are
+## validated (FieldPatcher) and written (ItemStore.update). Untouched fields
+## are neither copied, re-validated nor re-encoded.
+##
+## - JSON Merge Patch (RFC 7396): application/merge-patch+json, also accepted
+##   as plain application/json
+## - JSON Patch (RFC 6902): application/json-patch+json
+##
+## Malformed documents are 400, patches that can't be applied (missing path)
+## 422, and a failed "test" operation 409.
+
+def patch_openapi(model: type[BaseModel]) -> dict:
+    partial = model.model_json_schema()
+    partial.pop("required", None)
+    operation = {
+        "type": "object",
+        "required": ["op", "path"],
+        "properties": {
+            "op": {"enum": ["add", "remove", "replace", "move", "copy", "test"]},
+            "path": {"type": "string"},
+            "from": {"type": "string"},
+            "value": {},
+        },
+    }
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                MERGE_PATCH_CONTENT_TYPE: {"schema": partial},
+                JSON_PATCH_CONTENT_TYPE: {"schema": {"type": "array", "items": operation}},
+            },
+        }
+    }
+
+
+async def read_patch(request: Request) -> tuple[str, Any]:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("application/json", ""):
+        content_type = MERGE_PATCH_CONTENT_TYPE
+    if content_type not in (MERGE_PATCH_CONTENT_TYPE, JSON_PATCH_CONTENT_TYPE):
+        raise HTTPException(status_code=415, detail="Unsupported patch format", headers={"Accept-Patch": ACCEPT_PATCH})
+    try:
+        document = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+    if content_type == MERGE_PATCH_CONTENT_TYPE and not isinstance(document, dict):
+        raise HTTPException(status_code=422, detail="A merge patch for an item must be a JSON object")
+    if content_type == JSON_PATCH_CONTENT_TYPE and not isinstance(document, list):
+        raise HTTPException(status_code=400, detail="A JSON Patch must be an array of operations")
+    return content_type, document
+
+
+def apply_patch(content_type: str, document: Any, target: dict) -> dict[str, Any]:
+    if content_type == MERGE_PATCH_CONTENT_TYPE:
+        return merge_patch(target, document)
+    return json_patch(target, document)
+
+
+# JSON Merge Patch
+
+def _merge(target: Any, patch: Any) -> Any:
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge(result.get(key), value)
+    return result
+
+
+def merge_patch(target: dict, patch: dict) -> dict[str, Any]:
+    return {
+        key: REMOVED if value is None else _merge(target.get(key), value)
+        for key, value in patch.items()
+    }
+
+
+# JSON Patch
+
+def _pointer(pointer: Any) -> list[str]:
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise HTTPException(status_code=400, detail=f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer.split("/")[1:]]
+
+
+def _json_equal(a: Any, b: Any) -> bool:
+    # 1 == 1.0 but True != 1
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    if type(a) in (int, float) and type(b) in (int, float):
+        return a == b
+    return type(a) is type(b) and a == b
+
+
+class _Document:
+    # The target with copy-on-write top-level fields: a field is deep-copied
+    # the first time an operation reaches inside it, never the whole item
+    def __init__(self, target: dict):
+        self.root = dict(target)
+        self.touched: set[str] = set()
+        self._copied: set[str] = set()
+
+    def _index(self, container: list, token: str, for_add: bool = False) -> int:
+        if for_add and token == "-":
+            return len(container)
+        if not token.isdigit() or (token != "0" and token.startswith("0")):
+            raise HTTPException(status_code=422, detail=f"Invalid array index: {token!r}")
+        index = int(token)
+        if index > len(container) or (index == len(container) and not for_add):
+            raise HTTPException(status_code=422, detail=f"Array index out of range: {index}")
+        return index
+
+    def _parent(self, tokens: list[str], mutate: bool) -> Any:
+        if not tokens:
+            raise HTTPException(status_code=422, detail="Operations on the whole item are not supported")
+        field = tokens[0]
+        if mutate:
+            self.touched.add(field)
+            if len(tokens) > 1 and field not in self._copied and field in self.root:
+                self.root[field] = copy.deepcopy(self.root[field])
+                self._copied.add(field)
+        node = self.root
+        for token in tokens[:-1]:
+            node = self._child(node, token)
+        return node
+
+    def _child(self, node: Any, token: str) -> Any:
+        if isinstance(node, dict):
+            if token not in node:
+                raise HTTPException(status_code=422, detail=f"Path not found: {token!r}")
+            return node[token]
+        if isinstance(node, list):
+            return node[self._index(node, token)]
+        raise HTTPException(status_code=422, detail=f"Path not found: {token!r}")
+
+    def get(self, tokens: list[str]) -> Any:
+        return self._child(self._parent(tokens, mutate=False), tokens[-1])
+
+    def add(self, tokens: list[str], value: Any):
+        parent = self._parent(tokens, mutate=True)
+        if isinstance(parent, dict):
+            parent[tokens[-1]] = value
+        elif isinstance(parent, list):
+            parent.insert(self._index(parent, tokens[-1], for_add=True), value)
+        else:
+            raise HTTPException(status_code=422, detail=f"Path not found: {tokens[-1]!r}")
+
+    def remove(self, tokens: list[str]) -> Any:
+        self.get(tokens)  # must exist
+        parent = self._parent(tokens, mutate=True)
+        if isinstance(parent, dict):
+            return parent.pop(tokens[-1])
+        return parent.pop(self._index(parent, tokens[-1]))
+
+    def replace(self, tokens: list[str], value: Any):
+        self.remove(tokens)
+        self.add(tokens, value)
+
+
+def json_patch(target: dict, operations: list) -> dict[str, Any]:
+    document = _Document(target)
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise HTTPException(status_code=400, detail="Each operation needs an 'op' and a 'path'")
+        op = operation["op"]
+        path = _pointer(operation["path"])
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise HTTPException(status_code=400, detail=f"'{op}' needs a 'value'")
+        if op in ("move", "copy") and "from" not in operation:
+            raise HTTPException(status_code=400, detail=f"'{op}' needs a 'from'")
+
+        if op == "add":
+            document.add(path, operation["value"])
+        elif op == "remove":
+            document.remove(path)
+        elif op == "replace":
+            document.replace(path, operation["value"])
+        elif op == "move":
+            source = _pointer(operation["from"])
+            if path[:len(source)] == source and path != source:
+                raise HTTPException(status_code=422, detail="Cannot move a value into itself")
+            document.add(path, document.remove(source))
+        elif op == "copy":
+            document.add(path, copy.deepcopy(document.get(_pointer(operation["from"]))))
+        elif op == "test":
+            if not _json_equal(document.get(path), operation["value"]):
+                raise HTTPException(status_code=409, detail=f"Test failed at {operation['path']}")
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown operation: {op!r}")
+    return {field: document.root.get(field, REMOVED) for field in document.touched}
+
+
+# Validates the fields a patch changed, one TypeAdapter per model field
+## Per-field validation is equivalent to validating the whole model as long as
+## it has no model-level validators; models that do are validated whole.
+## Unknown fields are dropped, as the model ignores extra fields. Errors are
+## raised as RequestValidationError with FastAPI's ("body", field, ...) locs.
+
+class FieldPatcher:
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self.fields = model.model_fields
+        self.adapters = {
+            name: TypeAdapter(Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation)
+            for name, field in self.fields.items()
+        }
+        self.whole = bool(model.__pydantic_decorators__.model_validators)
+
+    def validate(self, changes: dict[str, Any], current: dict) -> dict[str, Any]:
+        changes = {name: value for name, value in changes.items() if name in self.fields}
+        if self.whole:
+            return self._validate_whole(changes, current)
+
+        validated, errors = {}, []
+        for name, value in changes.items():
+            field = self.fields[name]
+            if value is REMOVED:
+                if field.is_required():
+                    errors.append({"type": "missing", "loc": ("body", name), "msg": "Field required", "input": None})
+                else:
+                    validated[name] = field.get_default(call_default_factory=True)
+                continue
+            try:
+                validated[name] = self.adapters[name].validate_python(value)
+            except ValidationError as exc:
+                errors.extend(
+                    {**error, "loc": ("body", name, *error["loc"])} for error in exc.errors(include_url=False)
+                )
+        if errors:
+            raise RequestValidationError(errors)
+        return validated
+
+    def _validate_whole(self, changes: dict[str, Any], current: dict) -> dict[str, Any]:
+        data = {**current, **changes}
+        for name, value in changes.items():
+            if value is REMOVED:
+                del data[name]
+        try:
+            model = self.model.model_validate(data)
+        except ValidationError as exc:
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in exc.errors(include_url=False)]
+            )
+        return {name: getattr(model, name) for name in changes}
@@ -0,0 +1,227 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable
+import hashlib
+import math
+import time
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the key is back to its full allowance
+    retry_after: float  # seconds until the next request would be allowed
+
+
+# Backend interface
+## hit() records one request for `key` and says whether it is allowed.
+## The in-memory backends below are per process; a shared store (Redis, ...)
+## can implement the same coroutine to enforce limits across workers.
+
+class RateLimitBackend(ABC):
+    @abstractmethod
+    async def hit(self, key: str, limit: int, period: float, cost: int = 1) -> RateLimitDecision:
+        ...
+
+
+# Per-key state lives in an OrderedDict kept in last-seen order, so idle keys
+# sit at the front: keys idle for a whole period are dropped as we go (their
+# state is equivalent to a fresh key), and max_keys caps the table outright.
+class _KeyTable:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.entries: OrderedDict[str, list] = OrderedDict()
+        self.evictions = 0
+
+    def touch(self, key: str, default: Callable[[], list]) -> list:
+        state = self.entries.get(key)
+        if state is None:
+            state = self.entries[key] = default()
+            if len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.entries.move_to_end(key)
+        return state
+
+    def evict_idle(self, is_idle: Callable[[list], bool]):
+        # Amortized O(1): each key is popped at most once per time it was added
+        while self.entries:
+            key, state = next(iter(self.entries.items()))
+            if not is_idle(state):
+                break
+            del self.entries[key]
+            self.evictions += 1
+
+
+# Token bucket: `limit` tokens, refilled continuously at limit/period per second
+class TokenBucketBackend(RateLimitBackend):
+    def __init__(self, max_keys: int = 100_000, timer=time.monotonic):
+        self.timer = timer
+        self.keys = _KeyTable(max_keys)
+
+    async def hit(self, key: str, limit: int, period: float, cost: int = 1) -> RateLimitDecision:
+        now = self.timer()
+        rate = limit / period
+        state = self.keys.touch(key, lambda: [float(limit), now, period])  # [tokens, last_seen, period]
+        tokens = min(float(limit), state[0] + (now - state[1]) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        state[0], state[1] = tokens, now
+        self.keys.evict_idle(lambda s: now - s[1] >= s[2])
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=limit,
+            remaining=int(tokens),
+            reset_after=(limit - tokens) / rate,
+            retry_after=0.0 if allowed else (cost - tokens) / rate,
+        )
+
+
+# Sliding-window log: timestamps of the requests in the last `period` seconds
+class SlidingWindowLogBackend(RateLimitBackend):
+    def __init__(self, max_keys: int = 100_000, timer=time.monotonic):
+        self.timer = timer
+        self.keys = _KeyTable(max_keys)
+
+    async def hit(self, key: str, limit: int, period: float, cost: int = 1) -> RateLimitDecision:
+        now = self.timer()
+        log = self.keys.touch(key, lambda: [deque(), now, period])  # [timestamps, last_seen, period]
+        timestamps = log[0]
+        while timestamps and timestamps[0] <= now - period:
+            timestamps.popleft()
+        allowed = len(timestamps) + cost <= limit
+        if allowed:
+            timestamps.extend([now] * cost)
+        log[1] = now
+        self.keys.evict_idle(lambda s: now - s[1] >= s[2])
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=limit,
+            remaining=max(0, limit - len(timestamps)),
+            reset_after=timestamps[-1] + period - now if timestamps else 0.0,
+            retry_after=0.0 if allowed else timestamps[0] + period - now,
+        )
+
+
+def _client_ip(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+# Which requests a limit applies to and what it is counted against
+## key="ip": client address; key="token": the token header (hashed), falling
+## back to the client address; key="route": method + the matching path prefix,
+## shared by everyone. The middleware runs before routing, so there is no route
+## template to key on, and the raw path would give every /items/{id} (or any
+## made-up path under a prefix) a counter of its own.
+
+class RateLimitRule:
+    def __init__(
+        self,
+        limit: int,
+        period: float,
+        key: str = "ip",
+        methods: tuple[str, ...] | None = None,
+        path_prefixes: tuple[str, ...] = ("/",),
+        token_header: str = "token",
+    ):
+        if key not in ("ip", "token", "route"):
+            raise ValueError(f"Unknown rate limit key: {key}")
+        self.limit = limit
+        self.period = period
+        self.key = key
+        self.methods = methods
+        self.path_prefixes = path_prefixes
+        self.token_header = token_header.lower().encode()
+
+    def matches(self, scope: Scope) -> bool:
+        if self.methods is not None and scope["method"] not in self.methods:
+            return False
+        return scope["path"].startswith(self.path_prefixes)
+
+    def key_for(self, scope: Scope) -> str:
+        if self.key == "route":
+            prefix = next(prefix for prefix in self.path_prefixes if scope["path"].startswith(prefix))
+            return f"route:{scope['method']} {prefix}"
+        if self.key == "token":
+            token = _header(scope, self.token_header)
+            if token:
+                return "token:" + hashlib.sha256(token.encode()).hexdigest()[:32]
+        return "ip:" + _client_ip(scope)
+
+
+# Parse "100/60" (100 requests per 60 seconds)
+def parse_rate(rate: str) -> tuple[int, float]:
+    limit, _, period = rate.partition("/")
+    return int(limit), float(period or 1)
+
+
+# ASGI middleware enforcing a list of rules against one backend
+## Rejected requests get 429 with Retry-After; every limited response carries
+## X-RateLimit-Limit / -Remaining / -Reset for the tightest matching rule.
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, backend: RateLimitBackend, rules: list[RateLimitRule]):
+        self.app = app
+        self.backend = backend
+        self.rules = rules
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tightest = None
+        for index, rule in enumerate(self.rules):
+            if not rule.matches(scope):
+                continue
+            decision = await self.backend.hit(f"{index}:{rule.key_for(scope)}", rule.limit, rule.period)
+            if not decision.allowed:
+                tightest = decision
+                break
+            if tightest is None or decision.remaining < tightest.remaining:
+                tightest = decision
+
+        if tightest is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {
+            "X-RateLimit-Limit": str(tightest.limit),
+            "X-RateLimit-Remaining": str(tightest.remaining),
+            "X-RateLimit-Reset": str(math.ceil(tightest.reset_after)),
+        }
+
+        if not tightest.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(tightest.retry_after)))
+            headers["Content-Type"] = "application/json"
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Too Many Requests"}'})
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                for name, value in headers.items():
+                    response_headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
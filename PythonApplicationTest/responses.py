@@ -0,0 +1,51 @@
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import Any
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Fast JSON encoding
+## orjson when installed, stdlib json otherwise (and for the few values orjson
+## can't encode). Pydantic models are encoded by their own (compiled)
+## serializer instead of going through .dict() first.
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return jsonable_encoder(obj)
+
+
+def json_dumps(content: Any) -> bytes:
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode()
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=_default)
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers beyond 64 bits, which orjson rejects without calling default
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+# Drop-in JSONResponse replacement
+## Globally: FastAPI(default_response_class=FastJSONResponse)
+## Per route: @app.get(..., response_class=FastJSONResponse)
+## Returning FastJSONResponse(content) from a handler also skips FastAPI's
+## jsonable_encoder pass, which is where most of the per-request copying is.
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
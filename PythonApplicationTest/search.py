@@ -0,0 +1,272 @@
+from bisect import bisect_left, insort
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import sys
+import threading
+
+from item_store import ItemRecord, ItemStore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [sys.intern(token) for token in _TOKEN.findall(text.casefold())]
+
+
+# Full-text index over item name and description
+## Inverted index term -> {item_id: term frequency}, updated by a store
+## listener on every write (local or replayed). search() ranks with BM25 and
+## keeps the top `limit` with a heap; with prefix=True the last query word
+## also matches longer terms (autocomplete), through a sorted vocabulary;
+## those count `expansion_weight` times as much as the word itself.
+## Matching is "any word": more matching words rank higher.
+##
+## Snapshots: save() pickles the index with the store sequence it reflects.
+## load() before store.open() restores it, and the log replay then only
+## applies the writes made after that sequence, so startup doesn't re-tokenize
+## the whole catalog. verify() after open() rebuilds from the store if the
+## snapshot doesn't match it (older log, another store). The snapshot is a
+## trusted local file written by this process only.
+## Listeners may run on the store maintenance thread, hence the lock.
+
+class SearchIndex:
+    def __init__(
+        self,
+        store: ItemStore,
+        path: str | None = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        max_expansions: int = 50,
+        expansion_weight: float = 0.5,
+    ):
+        self.store = store
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_expansions = max_expansions
+        self.expansion_weight = expansion_weight
+
+        self._postings: dict[str, dict[int, int]] = {}
+        self._vocabulary: list[str] = []  # sorted terms, for prefix matching
+        self._doc_terms: dict[int, tuple[str, ...]] = {}  # distinct terms of each item
+        self._doc_lengths: dict[int, int] = {}
+        self._total_length = 0
+        self._seq = 0          # store sequence the index reflects
+        self._skip_upto = 0    # writes replayed at or below this are in the snapshot
+        self._saved_seq = 0
+        self._lock = threading.Lock()
+
+        self.queries = 0
+        self.loaded = False
+
+        store.subscribe(self._on_write)
+
+    # Maintenance
+
+    def _on_write(self, item_id: int, data: ItemRecord | None):
+        with self._lock:
+            # Version of the write being applied (a compacted log replays puts
+            # in id order, each with its own version, and has no deletes)
+            seq = self.store.seq if data is None else data.version
+            if seq <= self._skip_upto:
+                return
+            self._seq = max(self._seq, seq)
+            self._remove(item_id)
+            if data is not None:
+                self._add(item_id, f"{data.get('name') or ''} {data.get('description') or ''}")
+
+    def _add(self, item_id: int, text: str):
+        counts: dict[str, int] = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                insort(self._vocabulary, term)
+            posting[item_id] = tf
+        self._doc_terms[item_id] = tuple(counts)
+        length = sum(counts.values())
+        self._doc_lengths[item_id] = length
+        self._total_length += length
+
+    def _remove(self, item_id: int):
+        terms = self._doc_terms.pop(item_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self._postings[term]
+            del posting[item_id]
+            if not posting:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+        self._total_length -= self._doc_lengths.pop(item_id)
+
+    # Queries
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def _expand(self, prefix: str) -> list[str]:
+        # The most common terms starting with `prefix`
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + "\U0010ffff", start)
+        terms = self._vocabulary[start:end]
+        if len(terms) > self.max_expansions:
+            terms = heapq.nlargest(self.max_expansions, terms, key=lambda term: len(self._postings[term]))
+        return terms
+
+    def search(self, query: str, limit: int = 10, prefix: bool = False) -> list[tuple[int, float]]:
+        with self._lock:
+            self.queries += 1
+            words = list(dict.fromkeys(tokenize(query)))
+            if not words or not self._doc_lengths:
+                return []
+            expansions = None
+            if prefix and not query[-1].isspace():
+                *words, last = words
+                expansions = self._expand(last)
+
+            documents = len(self._doc_lengths)
+            average_length = self._total_length / documents or 1.0
+            k1, b, lengths = self.k1, self.b, self._doc_lengths
+
+            def term_scores(term: str, weight: float = 1.0):
+                posting = self._postings.get(term, {})
+                idf = weight * math.log(1 + (documents - len(posting) + 0.5) / (len(posting) + 0.5))
+                for item_id, tf in posting.items():
+                    yield item_id, idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[item_id] / average_length))
+
+            scores: dict[int, float] = {}
+            for word in words:
+                for item_id, score in term_scores(word):
+                    scores[item_id] = scores.get(item_id, 0.0) + score
+            if expansions is not None:
+                # The prefix counts once per item, by its best-scoring term
+                best: dict[int, float] = {}
+                for term in expansions:
+                    for item_id, score in term_scores(term, 1.0 if term == last else self.expansion_weight):
+                        if score > best.get(item_id, 0.0):
+                            best[item_id] = score
+                for item_id, score in best.items():
+                    scores[item_id] = scores.get(item_id, 0.0) + score
+            return heapq.nlargest(limit, scores.items(), key=lambda entry: entry[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self._doc_lengths),
+                "terms": len(self._postings),
+                "postings": sum(map(len, self._postings.values())),
+                "seq": self._seq,
+                "queries": self.queries,
+                "loaded_from_snapshot": self.loaded,
+            }
+
+    # Approximate bytes held by the index: its containers and term strings
+    # (the int keys and counts inside them are not counted)
+    def memory(self) -> dict[str, int]:
+        with self._lock:
+            postings = sys.getsizeof(self._postings) + sum(
+                sys.getsizeof(term) + sys.getsizeof(posting) for term, posting in self._postings.items()
+            )
+            documents = (
+                sys.getsizeof(self._doc_terms) + sum(map(sys.getsizeof, self._doc_terms.values()))
+                + sys.getsizeof(self._doc_lengths)
+            )
+            vocabulary = sys.getsizeof(self._vocabulary)
+        return {
+            "postings_bytes": postings,
+            "documents_bytes": documents,
+            "vocabulary_bytes": vocabulary,
+            "total_bytes": postings + documents + vocabulary,
+        }
+
+    # Snapshots
+
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "rb") as snapshot:
+                state = pickle.load(snapshot)
+            if state["format"] != SNAPSHOT_FORMAT:
+                return False
+        except Exception:
+            logger.warning("Ignoring unreadable search snapshot %s", self.path, exc_info=True)
+            return False
+        with self._lock:
+            # Terms are shared between postings and doc_terms (pickle memo);
+            # interning keeps them shared with terms tokenized from now on
+            self._postings = {sys.intern(term): posting for term, posting in state["postings"].items()}
+            self._doc_terms = state["doc_terms"]
+            self._doc_lengths = state["doc_lengths"]
+            self._vocabulary = sorted(self._postings)
+            self._total_length = sum(self._doc_lengths.values())
+            self._seq = self._skip_upto = self._saved_seq = state["seq"]
+        self.loaded = True
+        return True
+
+    def verify(self):
+        # After store.open(): stop skipping replayed writes, and rebuild if
+        # the snapshot is ahead of the log (an older log, another store).
+        ## Otherwise only reconcile the items: a compacted log has no deletes,
+        ## so items deleted before the compaction are dropped here, and items
+        ## the snapshot lacks are indexed.
+        with self._lock:
+            skipped, self._skip_upto = self._skip_upto, 0
+            if self.store.seq >= skipped:
+                item_ids = set(self.store.ids_after(None, sys.maxsize))
+                gone = self._doc_lengths.keys() - item_ids
+                for item_id in gone:
+                    self._remove(item_id)
+                missing = item_ids - self._doc_lengths.keys()
+                for item_id in missing:
+                    data = self.store.get(item_id)
+                    self._add(item_id, f"{data.get('name') or ''} {data.get('description') or ''}")
+                if gone or missing:
+                    logger.info("Search snapshot reconciled: %d items dropped, %d indexed", len(gone), len(missing))
+                    self._seq = max(self._seq, self.store.seq)
+                return
+        logger.warning("Search snapshot is ahead of the item store, rebuilding")
+        self.rebuild()
+
+    def rebuild(self):
+        with self._lock:
+            self._postings, self._vocabulary, self._doc_terms, self._doc_lengths = {}, [], {}, {}
+            self._total_length = 0
+            self.loaded = False
+            for item_id in self.store.ids_after(None, len(self.store)):
+                data = self.store.get(item_id)
+                self._add(item_id, f"{data.get('name') or ''} {data.get('description') or ''}")
+            self._seq = self.store.seq
+
+    def dirty(self, min_writes: int = 1) -> bool:
+        return self.path is not None and self._seq - self._saved_seq >= min_writes
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            seq = self._seq
+            data = pickle.dumps({
+                "format": SNAPSHOT_FORMAT,
+                "seq": seq,
+                "postings": self._postings,
+                "doc_terms": self._doc_terms,
+                "doc_lengths": self._doc_lengths,
+            }, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as tmp:
+            tmp.write(data)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.path)
+        self._saved_seq = seq
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+_HEADER = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+# HS256 JWT issuing and verification with a verified-token cache
+## A full verification (split, base64, JSON, HMAC, claims) runs once per
+## token; after that the token's SHA-256 maps to its claims in a bounded LRU
+## until the token's own `exp`, so repeat requests cost one hash + dict lookup.
+## Signatures are compared in constant time.
+
+class TokenVerifier:
+    def __init__(self, secret: bytes, cache_size: int = 10000, leeway: float = 0.0, timer=time.time):
+        self.secret = secret
+        self.cache_size = cache_size
+        self.leeway = leeway
+        self.timer = timer
+        self._cache: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        return hmac.new(self.secret, signing_input, hashlib.sha256).digest()
+
+    def issue(self, subject: str, ttl: float = 3600, **claims) -> str:
+        now = int(self.timer())
+        payload = {"sub": subject, "iat": now, "exp": now + int(ttl), **claims}
+        signing_input = f"{_HEADER}.{_b64encode(json.dumps(payload, separators=(',', ':')).encode())}"
+        return f"{signing_input}.{_b64encode(self._sign(signing_input.encode()))}"
+
+    def verify(self, token: str) -> dict:
+        key = hashlib.sha256(token.encode()).digest()
+        now = self.timer()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[0] + self.leeway > now:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached[1]
+                del self._cache[key]
+        self.misses += 1
+
+        claims = self._verify_uncached(token, now)
+        with self._lock:
+            self._cache[key] = (claims["exp"], claims)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return claims
+
+    def _verify_uncached(self, token: str, now: float) -> dict:
+        try:
+            header, payload, signature = token.split(".")
+            signature = _b64decode(signature)
+        except ValueError:
+            raise InvalidToken("Malformed token")
+        if not hmac.compare_digest(signature, self._sign(f"{header}.{payload}".encode())):
+            raise InvalidToken("Bad signature")
+        try:
+            if json.loads(_b64decode(header)).get("alg") != "HS256":
+                raise InvalidToken("Unsupported algorithm")
+            claims = json.loads(_b64decode(payload))
+            exp = float(claims["exp"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise InvalidToken("Malformed claims")
+        if exp + self.leeway <= now:
+            raise InvalidToken("Token expired")
+        return claims
+
+    def stats(self) -> dict:
+        return {"size": len(self._cache), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
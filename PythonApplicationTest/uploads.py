@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+import hashlib
+import os
+import uuid
+
+# 1 MiB chunks keep the per-request footprint constant regardless of file size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class UploadResult:
+    filename: str | None
+    size: int
+    sha256: str
+    path: str | None = None
+
+
+# Consume an UploadFile chunk by chunk instead of `await file.read()`
+## Size and SHA-256 are computed incrementally; with spool_dir set, each chunk
+## is also written to a file there (in the threadpool, off the event loop).
+
+async def stream_upload(
+    file: UploadFile,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    spool_dir: str | None = None,
+) -> UploadResult:
+    digest = hashlib.sha256()
+    size = 0
+    path = None
+    out = None
+    if spool_dir is not None:
+        os.makedirs(spool_dir, exist_ok=True)
+        path = os.path.join(spool_dir, uuid.uuid4().hex)
+        out = await run_in_threadpool(open, path, "wb")
+    try:
+        while chunk := await file.read(chunk_size):
+            size += len(chunk)
+            digest.update(chunk)
+            if out is not None:
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.remove(path)
+        raise
+    if out is not None:
+        await run_in_threadpool(out.close)
+    return UploadResult(filename=file.filename, size=size, sha256=digest.hexdigest(), path=path)
+
+
+# Leading bytes of common binary formats
+MAGIC_TYPES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x1f\x8b", "application/gzip"),
+)
+
+
+def sniff_content_type(head: bytes) -> str:
+    for magic, content_type in MAGIC_TYPES:
+        if head.startswith(magic):
+            return content_type
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError:
+        return "application/octet-stream"
+    return "text/plain"
+
+
+# Post-processing of a spooled upload, run as a background job
+## Re-hashes the file to check it was spooled intact, sniffs its type and moves
+## it into content-addressed storage at store_dir/<sha256[:2]>/<sha256>; a
+## file already stored is deduplicated. Safe to retry: if an earlier attempt
+## already moved the file, the stored copy is used.
+
+def finalize_upload(spool_path: str, sha256: str, store_dir: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> dict:
+    target = os.path.join(store_dir, sha256[:2], sha256)
+    source = spool_path if os.path.exists(spool_path) else target
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    with open(source, "rb") as spooled:
+        while chunk := spooled.read(chunk_size):
+            if not head:
+                head = chunk[:16]
+            size += len(chunk)
+            digest.update(chunk)
+    if digest.hexdigest() != sha256:
+        raise ValueError(f"Checksum mismatch for {source}")
+
+    deduplicated = False
+    if source == spool_path:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            os.remove(spool_path)
+            deduplicated = True
+        else:
+            os.replace(spool_path, target)
+    return {"path": target, "size": size, "content_type": sniff_content_type(head), "deduplicated": deduplicated}
+
+
+async def process_upload(payload: dict, store_dir: str) -> dict:
+    return await run_in_threadpool(finalize_upload, payload["path"], payload["sha256"], store_dir)
@@ -0,0 +1,160 @@
+from annotated_types import Ge, Gt, Le, Lt, MaxLen, MinLen
+from fastapi.dependencies.models import Dependant
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Any, Callable, Literal, Union, get_args, get_origin
+from urllib.parse import parse_qsl
+import math
+import re
+import sys
+import types
+
+# Outcome of a precompiled check: True = certainly valid, False = certainly
+# invalid, None = can't tell cheaply (e.g. " 3" or "1_0", which pydantic accepts)
+Check = Callable[[Any], bool | None]
+
+# Regex metacharacters; a pattern without them between ^ and $ is a literal
+_LITERAL_PATTERN = re.compile(r"\^((?:[^\\.^$*+?{}\[\]|()]|\\[\\.^$*+?{}\[\]|()])*)\$")
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _int_check(metadata: list) -> Check | None:
+    # Fused range: every bound folded into one lo <= value <= hi comparison
+    lo, hi = -math.inf, math.inf
+    for constraint in metadata:
+        if isinstance(constraint, Ge):
+            lo = max(lo, constraint.ge)
+        elif isinstance(constraint, Gt):
+            lo = max(lo, math.floor(constraint.gt) + 1)
+        elif isinstance(constraint, Le):
+            hi = min(hi, constraint.le)
+        elif isinstance(constraint, Lt):
+            hi = min(hi, math.ceil(constraint.lt) - 1)
+        else:
+            return None
+
+    def check(raw: Any) -> bool | None:
+        if not isinstance(raw, str) or not raw.isascii() or not raw.isdigit() or len(raw) > 18:
+            return None
+        return lo <= int(raw) <= hi
+    return check
+
+
+def _str_check(metadata: list) -> Check | None:
+    min_length, max_length, pattern = 0, sys.maxsize, None
+    for constraint in metadata:
+        if isinstance(constraint, MinLen):
+            min_length = constraint.min_length
+        elif isinstance(constraint, MaxLen):
+            max_length = constraint.max_length
+        elif getattr(constraint, "pattern", None) is not None and len(vars(constraint)) == 1:
+            pattern = constraint.pattern
+        else:
+            return None
+
+    if pattern is None:
+        return lambda raw: min_length <= len(raw) <= max_length if isinstance(raw, str) else None
+
+    literal = _LITERAL_PATTERN.fullmatch(pattern)
+    if literal:
+        # An anchored literal: the only valid value is that string, so length
+        # and pattern collapse into one equality test
+        expected = re.sub(r"\\(.)", r"\1", literal.group(1))
+        valid = min_length <= len(expected) <= max_length
+        return lambda raw: valid and raw == expected if isinstance(raw, str) else None
+
+    try:
+        search = re.compile(pattern).search
+    except re.error:
+        return None
+    return lambda raw: (min_length <= len(raw) <= max_length and search(raw) is not None) if isinstance(raw, str) else None
+
+
+def compile_check(field) -> Check | None:
+    annotation = _unwrap_optional(field.field_info.annotation)
+    metadata = field.field_info.metadata
+    if annotation is int:
+        return _int_check(metadata)
+    if annotation is str:
+        return _str_check(metadata)
+    if get_origin(annotation) is Literal and not metadata:
+        choices = frozenset(get_args(annotation))
+        if all(isinstance(choice, str) for choice in choices):
+            return lambda raw: raw in choices if isinstance(raw, str) else None
+    return None
+
+
+# Path/query parameters of a route in the order FastAPI validates them
+# (sub-dependencies first), keeping only those we can check
+def _compiled_params(dependant: Dependant) -> list[tuple[str, Any, Check]]:
+    params = []
+    for sub in dependant.dependencies:
+        params.extend(_compiled_params(sub))
+    for location, fields in (("path", dependant.path_params), ("query", dependant.query_params)):
+        for field in fields:
+            check = compile_check(field)
+            if check is not None:
+                params.append((location, field, check))
+    return params
+
+
+# Route class rejecting requests whose path/query parameters violate its constraints
+## Constraints declared with Path()/Query() are compiled once, when the route
+## is registered, into plain Python checks: integer bounds fused into one range
+## test, length limits, precompiled regexes, and anchored literal patterns such
+## as "^fixedquery$" reduced to string equality. They run right after routing;
+## a request that fails them raises FastAPI's RequestValidationError without
+## building a Request, resolving dependencies or reading the body.
+## The checks only decide when to reject: errors come from FastAPI's validation
+## of the same fields, so the 422 is unchanged, and values the checks can't judge
+## cheaply (" 3", "1_0") fall through to the handler. Body, header and cookie
+## errors are not reported alongside, since the body isn't read.
+##
+## app.router.route_class = FastRejectRoute  (before declaring routes)
+
+class FastRejectRoute(APIRoute):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compiled_params = _compiled_params(self.dependant)
+        if self.compiled_params:
+            self.app = self._fast_reject(self.app)
+
+    def _fast_reject(self, handler: ASGIApp) -> ASGIApp:
+        params = self.compiled_params
+
+        async def app(scope: Scope, receive: Receive, send: Send):
+            path_params = scope["path_params"]
+            query = dict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+            for location, field, check in params:
+                values = path_params if location == "path" else query
+                if field.alias in values:
+                    if check(values[field.alias]) is not True:
+                        break
+                elif field.required:
+                    break
+            else:
+                await handler(scope, receive, send)
+                return
+
+            errors = []
+            for location, field, check in params:
+                values = path_params if location == "path" else query
+                loc = (location, field.alias)
+                if field.alias not in values:
+                    if field.required:
+                        errors.append({"type": "missing", "loc": loc, "msg": "Field required", "input": None})
+                    continue
+                _, field_errors = field.validate(values[field.alias], {}, loc=loc)
+                errors.extend(field_errors or [])
+            if errors:
+                raise RequestValidationError(errors)
+            await handler(scope, receive, send)
+        return app